@@ -1,22 +1,33 @@
 import json
 import csv
+import re
 from collections import defaultdict
 
+try:
+    import orjson  # Optional: much faster than json for large videos.json
+except ImportError:
+    orjson = None
+
+def load_videos(input_file):
+    """Load the videos JSON array, using orjson when it is installed."""
+    if orjson is not None:
+        with open(input_file, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(input_file, 'r') as f:
+        return json.load(f)
+
+_DURATION_RE = re.compile(r'^(?:(\d+):)?(\d+):(\d+)$')
+
 def parse_duration(duration_str):
-    """Parse duration string like '0:07:15' to seconds."""
-    parts = duration_str.split(':')
-    if len(parts) == 3:
-        hours, minutes, seconds = map(int, parts)
-        return hours * 3600 + minutes * 60 + seconds
-    elif len(parts) == 2:
-        minutes, seconds = map(int, parts)
-        return minutes * 60 + seconds
-    else:
+    """Parse duration string like '0:07:15' or '07:15' to seconds."""
+    match = _DURATION_RE.match(duration_str)
+    if not match:
         return 0
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
 
 def generate_analytics(input_file, output_file):
-    with open(input_file, 'r') as f:
-        data = json.load(f)
+    data = load_videos(input_file)
     
     channel_stats = defaultdict(lambda: {
         'num_videos': 0,
@@ -28,13 +39,14 @@ def generate_analytics(input_file, output_file):
     })
     
     for video in data:
-        channel = video['channelTitle']
-        channel_stats[channel]['num_videos'] += 1
-        channel_stats[channel]['total_duration'] += parse_duration(video['duration'])
-        channel_stats[channel]['total_views'] += int(video['viewCount'])
-        channel_stats[channel]['total_likes'] += int(video['likeCount'])
-        channel_stats[channel]['total_favorites'] += int(video['favoriteCount'])
-        channel_stats[channel]['total_comments'] += int(video['commentCount'])
+        # Look the channel up once per video instead of once per field
+        stats = channel_stats[video['channelTitle']]
+        stats['num_videos'] += 1
+        stats['total_duration'] += parse_duration(video['duration'])
+        stats['total_views'] += int(video['viewCount'])
+        stats['total_likes'] += int(video['likeCount'])
+        stats['total_favorites'] += int(video['favoriteCount'])
+        stats['total_comments'] += int(video['commentCount'])
     
     with open(output_file, 'w', newline='') as csvfile:
         fieldnames = ['Channel', 'Num_Videos', 'Total_Duration_Hours', 'Total_Views', 'Total_Likes', 'Total_Favorites', 'Total_Comments']
@@ -2,20 +2,24 @@ import json
 import csv
 import os
 
+try:
+    import orjson  # Optional: much faster than json for large videos.json
+except ImportError:
+    orjson = None
+
 # Load the videos.json file
-with open('output/videos.json', 'r') as f:
-    videos = json.load(f)
+if orjson is not None:
+    with open('output/videos.json', 'rb') as f:
+        videos = orjson.loads(f.read())
+else:
+    with open('output/videos.json', 'r') as f:
+        videos = json.load(f)
 
-# Prepare the CSV data
-csv_data = []
-for video in videos:
-    video_id = video['videoId']
-    channel_id = video['channelId']
-    status = ""  # or set to 'pending' or whatever default
-    csv_data.append([video_id, channel_id, status])
+# Prepare the CSV data; status starts empty (pending)
+csv_data = [(video['videoId'], video['channelId'], "") for video in videos]
 
 # Write to download.csv
-with open('output/download.csv', 'w', newline='') as f:
+with open('output/download.csv', 'w', newline='', buffering=1024 * 1024) as f:
     writer = csv.writer(f)
     writer.writerow(['videoId', 'channelId', 'status'])
     writer.writerows(csv_data)
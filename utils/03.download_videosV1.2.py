@@ -3,15 +3,16 @@ import sys
 import csv
 import time
 import random
+import re
 import logging
 import argparse
+import multiprocessing
 import threading
-import fcntl  # For file locking
-import tempfile
 import ssl
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import List, Tuple, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Set, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 import yt_dlp
 from dataclasses import dataclass, field
 
@@ -20,77 +21,100 @@ class Config:
     CSV_FILE: Path = Path("output/download.csv")
     OUTPUT_DIR: Path = Path.home() / "Downloads" / "YouTube"
     CONCURRENT_FRAGMENTS: int = random.randint(16, 32)
-    BATCH_DOWNLOAD_SIZE: int = random.randint(8, 16)
+    MAX_WORKERS: int = 8  # Concurrent downloads (one worker process each), capped at the CPU count
+    YDL_ROTATE_AFTER: int = 20  # Downloads before a worker re-rolls its cookie file and client
+    PROBE_WORKERS: int = 0  # Threads for the metadata-only pass that prunes unavailable videos; 0 disables it (each probe is an extra extraction request)
+    PROBE_BATCH_SIZE: int = 16  # URLs probed together just before they are queued for download
     cookies_dir: Path = Path("input/Cookies")
     ARCHIVE_FILE: Path = Path("output/download_archive.txt")
+    JOURNAL_FILE: Path = Path("output/download_journal.log")  # Append-only status/archive log, merged into CSV_FILE and ARCHIVE_FILE by Journal.compact_into
+    IO_BUFFER_SIZE: int = 1024 * 1024  # 1MB buffer for whole-file CSV/archive reads and writes
 config = Config()
 
 config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-csv_lock = threading.Lock()
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)s] %(asctime)s %(message)s",
-    handlers=[
-        logging.FileHandler("output/download_log.txt", mode='a'),
-        logging.StreamHandler()
-    ]
-)
+# Snapshot of the CSV taken once by load_csv_index() and used to pick what to download.
+# It is never written back directly: results go to the journal, and Journal.compact_into
+# rewrites the CSV once at the end of the run
+_csv_index: Dict[str, List[str]] = {}
+_fieldnames: List[str] = []
+_status_col = 0
+
+# Log records from the parent and every worker process go through one queue; a single listener
+# thread in the parent formats them and does the file/console I/O
+_log_handlers = [
+    logging.FileHandler("output/download_log.txt", mode='a'),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(logging.Formatter("[%(levelname)s] %(asctime)s %(message)s"))
+_log_queue = multiprocessing.Queue(-1)
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+# Only the message is rendered here; the listener's handlers apply the full format
+logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[QueueHandler(_log_queue)])
 log = logging.getLogger(__name__)
 
+def init_worker_logging(log_queue):
+    """ProcessPoolExecutor initializer: send worker log records to the parent's listener"""
+    logging.getLogger().handlers = [QueueHandler(log_queue)]
+
 def progress_hook(d):
     if d['status'] == 'finished':
         log.info(f"[DOWNLOAD FINISHED] {d['filename']}")
     elif d['status'] == 'error':
         log.error(f"[DOWNLOAD ERROR] {d.get('filename', 'unknown')}: {d.get('error', 'unknown error')}")
 
+USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:115.0) Gecko/20100101 Firefox/115.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; SM-G998B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPad; CPU OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1"
+)
+LANGUAGES = ("en-US,en;q=0.9",
+             "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7", "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7",
+             "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7", "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7")
+INNERTUBE_CLIENTS = ("web", "android", "mweb", "ios", "tv", "web_creator", "web_safari")
+
+# Options that are identical for every YoutubeDL instance; build_yt_dlp_opts copies this and adds the randomized parts
+_STATIC_OPTS = {
+    "format_sort": ["+size", "+br", "+res", "+fps"],
+    "retries": 10,  # Increased for SSL issues
+    "fragment_retries": 15,  # Increased for SSL issues
+    "retry_sleep": 5.0,  # Wait 5 seconds between retries
+    "retry_sleep_functions": {"http": lambda n: min(5 + n * 2, 30)},  # Progressive backoff
+    "socket_timeout": 30,  # Longer socket timeout for VPN
+    "http_chunk_size": 10 * 1024 * 1024,  # 10MB ranges so each connection stays busy past TCP slow start
+    "quiet": True,
+    "no_warnings": True,
+    "progress_hooks": [progress_hook],
+    "extractor_retries": 3,
+    "skip_unavailable_fragments": True,
+    "keep_fragments": False,
+    "ignoreerrors": True,
+    "no_check_certificate": False,
+    "prefer_insecure": False,
+}
+
 def build_yt_dlp_opts() -> dict:
-    user_agents = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:115.0) Gecko/20100101 Firefox/115.0",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
-        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
-        "Mozilla/5.0 (Linux; Android 14; SM-G998B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Mobile Safari/537.36",
-        "Mozilla/5.0 (iPad; CPU OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1"
-    ]
-    
-    user_agent = random.choice(user_agents)
-    
-    languages = ["en-US,en;q=0.9", 
-                 "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7", "de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7",
-                 "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7", "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7"]
-    accept_language = random.choice(languages)
-    
-    opts = {
+    opts = _STATIC_OPTS.copy()
+    opts.update({
         "outtmpl": str(config.OUTPUT_DIR / "%(id)s.%(ext)s"),
-        "format_sort": ["+size", "+br", "+res", "+fps"],
         "concurrent_fragments": min(config.CONCURRENT_FRAGMENTS, 8),
-        "sleep_interval": random.uniform(2.0, 5.0) + random.uniform(0.1, 0.5),
-        "max_sleep_interval": random.uniform(2.0, 5.0) + random.uniform(0.5, 1.5),
-        "retries": 10,  # Increased for SSL issues
-        "fragment_retries": 15,  # Increased for SSL issues
-        "retry_sleep": 5.0,  # Wait 5 seconds between retries
-        "retry_sleep_functions": {"http": lambda n: min(5 + n * 2, 30)},  # Progressive backoff
-        "socket_timeout": 30,  # Longer socket timeout for VPN
-        "quiet": True,
-        "no_warnings": True,
-        "progress_hooks": [progress_hook],
-        "user_agent": user_agent,
+        "sleep_interval": random.uniform(2.1, 5.5),
+        "max_sleep_interval": random.uniform(2.5, 6.5),
+        "user_agent": random.choice(USER_AGENTS),
         "http_headers": {
-            "Accept-Language": accept_language,
+            "Accept-Language": random.choice(LANGUAGES),
             "Referer": "https://www.youtube.com/",
             "Connection": "keep-alive",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
         },
-        "extractor_retries": 3,
-        "skip_unavailable_fragments": True,
-        "keep_fragments": False,
-        "ignoreerrors": True,
-    }
+    })
     
-    client_to_emulate = random.choice(["web", "android", "mweb", "ios", "tv", "web_creator", "web_safari"])
-    log.info(f"Using '{client_to_emulate}' client for this batch.")
+    client_to_emulate = random.choice(INNERTUBE_CLIENTS)
+    log.info(f"Using '{client_to_emulate}' client for this worker.")
 
     opts["extractor_args"] = {
         "youtube": {
@@ -103,20 +127,18 @@ def build_yt_dlp_opts() -> dict:
     
     if "cookiefile" not in opts and "cookiesfrombrowser" not in opts:
         log.warning("No authentication method available. Bot detection likely increased.")
-        
-    opts["no_check_certificate"] = False
-    opts["prefer_insecure"] = False
 
     return opts
 
-def is_cookie_file_valid(cookie_file: Path) -> bool:
-    if not cookie_file.exists():
-        return False
-    
+# Validated cookie files (newest first), reused while the cookies directory mtime is unchanged
+# and the TTL has not expired; the TTL also catches cookie files edited in place.
+# Per-file validation results are memoized by (path, mtime, size).
+COOKIE_CACHE_TTL = 60.0
+_cookie_cache = {"mtime": None, "files": [], "expires": 0.0}
+_cookie_valid_cache: Dict[Tuple[str, float, int], bool] = {}
+
+def _check_cookie_file(cookie_file: Path) -> bool:
     try:
-        if cookie_file.stat().st_size < 10:
-            return False
-        
         with open(cookie_file, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read(1024)
             youtube_domains = ['youtube.com', '.google.com']
@@ -125,34 +147,63 @@ def is_cookie_file_valid(cookie_file: Path) -> bool:
         log.warning(f"Error validating cookie file {cookie_file}: {e}")
         return False
 
+def is_cookie_file_valid(cookie_file: Path) -> bool:
+    try:
+        st = cookie_file.stat()
+    except OSError:
+        return False
+
+    if st.st_size < 10:
+        return False
+
+    key = (str(cookie_file), st.st_mtime, st.st_size)
+    valid = _cookie_valid_cache.get(key)
+    if valid is None:
+        valid = _check_cookie_file(cookie_file)
+        _cookie_valid_cache[key] = valid
+    return valid
+
 def get_cookies_files() -> List[Path]:
     if not config.cookies_dir.exists():
         return []
     return [f for f in config.cookies_dir.glob("*.txt") if f.is_file()]
 
+def get_valid_cookie_files() -> List[str]:
+    """Valid cookie file paths sorted newest first, served from cache when nothing changed"""
+    try:
+        dir_mtime = config.cookies_dir.stat().st_mtime
+    except OSError:
+        return []
+
+    now = time.time()
+    if _cookie_cache["mtime"] == dir_mtime and now < _cookie_cache["expires"]:
+        return _cookie_cache["files"]
+
+    valid_files = []
+    for f in get_cookies_files():
+        if is_cookie_file_valid(f):
+            valid_files.append((str(f), f.stat().st_mtime))
+    valid_files.sort(key=lambda x: x[1], reverse=True)
+
+    _cookie_cache.update(mtime=dir_mtime, files=[f[0] for f in valid_files], expires=now + COOKIE_CACHE_TTL)
+    return _cookie_cache["files"]
+
 def rotate_cookies() -> Optional[str]:
-    cookies_files = get_cookies_files()
-    valid_files = [(f, f.stat().st_mtime) for f in cookies_files if is_cookie_file_valid(f)]
+    valid_file_paths = get_valid_cookie_files()
     
-    if not valid_files:
+    if not valid_file_paths:
         log.info("No valid cookie files found")
         return None
     
-    valid_files.sort(key=lambda x: x[1], reverse=True)
-    valid_file_paths = [str(f[0]) for f in valid_files]
-    
-    weighted_files = []
     file_count = len(valid_file_paths)
-    for i, file_path in enumerate(valid_file_paths):
-        if file_count >= 3:
-            weight = max(1, 4 - i)
-        elif file_count == 2:
-            weight = 2 if i == 0 else 1
-        else:
-            weight = 1
-        weighted_files.extend([file_path] * weight)
+    if file_count >= 3:
+        weights = [max(1, 4 - i) for i in range(file_count)]
+    elif file_count == 2:
+        weights = [2, 1]
+    else:
+        weights = [1]
     
-    selected_file = random.choice(weighted_files)
+    selected_file = random.choices(valid_file_paths, weights=weights, k=1)[0]
     log.info(f"Selected cookie file: {selected_file} (one of {len(valid_file_paths)} valid files)")
     return selected_file
 
@@ -168,118 +219,182 @@ def get_cookies_config() -> dict:
     log.warning("No valid cookie sources available. Bot detection likely.")
     return cookies_config
 
-def verify_download_exists(video_id: str) -> bool:
-    """Check if video file actually exists in output directory"""
-    common_extensions = ['.mp4', '.webm', '.mkv', '.m4a']
-    for ext in common_extensions:
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.m4a')
+
+def scan_output_dir() -> Dict[str, int]:
+    """Map video_id -> size for every video file in the output directory, using one directory listing"""
+    downloaded = {}
+    try:
+        with os.scandir(config.OUTPUT_DIR) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext in VIDEO_EXTENSIONS and entry.is_file():
+                    downloaded[stem] = max(downloaded.get(stem, 0), entry.stat().st_size)
+    except OSError as e:
+        log.error(f"Error scanning {config.OUTPUT_DIR}: {e}")
+    return downloaded
+
+def verify_download_exists(video_id: str, downloaded: Optional[Dict[str, int]] = None) -> bool:
+    """Check if video file actually exists in output directory, using a scan_output_dir() snapshot if given"""
+    if downloaded is not None:
+        return downloaded.get(video_id, 0) > 1024  # At least 1KB
+    for ext in VIDEO_EXTENSIONS:
         file_path = config.OUTPUT_DIR / f"{video_id}{ext}"
         if file_path.exists() and file_path.stat().st_size > 1024:  # At least 1KB
             return True
     return False
 
-def add_to_archive(video_id: str):
-    """Add video ID to download archive after successful verification"""
-    try:
-        with config.ARCHIVE_FILE.open('a', encoding='utf-8') as f:
-            f.write(f"youtube {video_id}\n")
-        log.debug(f"Added {video_id} to archive")
-    except Exception as e:
-        log.error(f"Error adding {video_id} to archive: {e}")
-
-def remove_from_archive(video_id: str):
-    """Remove video ID from download archive if download failed"""
-    if not config.ARCHIVE_FILE.exists():
-        return
-    
-    try:
-        with config.ARCHIVE_FILE.open('r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # Filter out the failed video
-        updated_lines = [line for line in lines if not line.strip().endswith(video_id)]
-        
-        if len(updated_lines) < len(lines):
-            with config.ARCHIVE_FILE.open('w', encoding='utf-8') as f:
-                f.writelines(updated_lines)
-            log.debug(f"Removed {video_id} from archive")
-    except Exception as e:
-        log.error(f"Error removing {video_id} from archive: {e}")
-
-def update_csv_status(video_id: str, status: str):
-    """Update CSV status with proper file locking for multi-process safety"""
-    if not config.CSV_FILE.exists():
-        return
-
-    # Use a more unique temp file name to avoid conflicts between processes
-    import os
-    pid = os.getpid()
-    timestamp = int(time.time() * 1000000)  # microsecond precision
-    temp_file = config.CSV_FILE.parent / f'download_temp_{pid}_{timestamp}.csv'
-    
-    max_retries = 5
-    retry_delay = 0.1
-    
-    for attempt in range(max_retries):
+def read_csv_table(csv_file: Path) -> Tuple[List[str], List[List[str]], int, int]:
+    """Read the CSV as list rows padded to the header; returns (fieldnames, rows, id column, status column)"""
+    with csv_file.open('r', newline='', encoding='utf-8', buffering=config.IO_BUFFER_SIZE) as f:
+        reader = csv.reader(f)
+        fieldnames = next(reader, [])
+        if 'videoId' not in fieldnames:
+            raise ValueError(f"No videoId column in {csv_file}")
+        if 'status' not in fieldnames:
+            fieldnames.append('status')
+
+        width = len(fieldnames)
+        rows = []
+        for row in reader:
+            if not row:
+                continue  # Blank line, skipped as DictReader did
+            if len(row) < width:
+                row.extend([''] * (width - len(row)))
+            rows.append(row)
+    return fieldnames, rows, fieldnames.index('videoId'), fieldnames.index('status')
+
+def load_csv_index():
+    """Load the CSV once into memory, keyed by videoId"""
+    global _fieldnames, _status_col
+    _fieldnames, rows, id_col, _status_col = read_csv_table(config.CSV_FILE)
+    _csv_index.clear()
+    for row in rows:
+        if row[id_col]:
+            _csv_index[row[id_col]] = row
+    log.info(f"Loaded {len(_csv_index)} videos from {config.CSV_FILE}")
+
+class Journal:
+    """
+    Append-only log of everything a run changes: status updates and archive additions/removals.
+
+    Each event is a single O_APPEND write, so neither the CSV nor the archive is rewritten while
+    downloads are running. compact_into() merges the log into both files and deletes it; a log
+    left behind by an interrupted run is merged at the next startup.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def _append(self, line: str):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._fd, line.encode('utf-8'))
+
+    def status(self, video_id: str, status: str):
+        self._append(f"status {video_id} {status}\n")
+
+    def archive(self, video_id: str):
+        self._append(f"archive {video_id}\n")
+
+    def unarchive(self, video_id: str):
+        self._append(f"unarchive {video_id}\n")
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def replay(self) -> Tuple[Dict[str, str], Dict[str, bool]]:
+        """Return the last status and the last archive state (True = archived) per video"""
+        statuses, archived = {}, {}
+        if not self.path.exists():
+            return statuses, archived
+        with self.path.open('r', encoding='utf-8', buffering=config.IO_BUFFER_SIZE) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[0] == 'status':
+                    statuses[parts[1]] = parts[2]  # Last write wins
+                elif len(parts) == 2 and parts[0] in ('archive', 'unarchive'):
+                    archived[parts[1]] = parts[0] == 'archive'
+        return statuses, archived
+
+    def compact_into(self, csv_file: Path, archive_file: Path):
+        """Apply the log to the archive and the CSV, mark archived videos done, then delete the log"""
+        self.close()
+        statuses, archived = self.replay()
         try:
-            # Use file locking to prevent race conditions between processes
-            with config.CSV_FILE.open('r+', newline='', encoding='utf-8') as csvfile:
-                # Lock the file for exclusive access
-                fcntl.flock(csvfile.fileno(), fcntl.LOCK_EX)
-                
-                try:
-                    csvfile.seek(0)
-                    reader = csv.DictReader(csvfile)
-                    fieldnames = reader.fieldnames
-                    if fieldnames and 'status' not in fieldnames:
-                        fieldnames.append('status')
-
-                    rows = []
-                    found = False
-                    
-                    for row in reader:
-                        if row.get('videoId') == video_id:
-                            row['status'] = status
-                            found = True
-                        rows.append(row)
-                    
-                    if found:
-                        # Write to temporary file first
-                        with temp_file.open('w', newline='', encoding='utf-8') as tempfile:
-                            writer = csv.DictWriter(tempfile, fieldnames=fieldnames)
-                            writer.writeheader()
-                            writer.writerows(rows)
-                        
-                        # Atomically replace the original file
-                        temp_file.replace(config.CSV_FILE)
-                        log.debug(f"Updated status for {video_id}: {status}")
-                        break
-                    else:
-                        log.warning(f"Video ID {video_id} not found in CSV")
-                        break
-                        
-                finally:
-                    # Unlock the file
-                    fcntl.flock(csvfile.fileno(), fcntl.LOCK_UN)
-                    
-        except (IOError, OSError) as e:
-            if attempt < max_retries - 1:
-                log.warning(f"CSV update attempt {attempt + 1} failed for {video_id}, retrying in {retry_delay}s: {e}")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                log.error(f"Failed to update CSV status after {max_retries} attempts for {video_id}: {e}")
-        except Exception as e:
-            log.error(f"Unexpected error updating CSV status for {video_id}: {e}")
-            break
-        finally:
-            # Clean up temp file if it exists
-            if temp_file.exists():
-                try:
-                    temp_file.unlink()
-                except:
-                    pass
-
-def generate_archive_from_csv():
+            archived_ids = self._compact_archive(archive_file, archived)
+            self._compact_csv(csv_file, statuses, archived_ids)
+        except (IOError, OSError, ValueError) as e:
+            log.error(f"Failed to merge {self.path}, keeping it for the next run: {e}")
+            return
+        self.path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _compact_archive(archive_file: Path, archived: Dict[str, bool]) -> Set[str]:
+        """Rewrite the archive once with the logged additions/removals; returns the archived IDs"""
+        if not archive_file.exists():
+            # generate_archive_from_csv builds it from the CSV's done rows on the next run
+            return set()
+
+        with archive_file.open('r', encoding='utf-8', buffering=config.IO_BUFFER_SIZE) as f:
+            lines = [line.strip() for line in f if line.strip()]
+
+        kept = [line for line in lines if archived.get(line.split(' ', 1)[-1], True)]
+        archived_ids = {line.split(' ', 1)[1] for line in kept if line.startswith('youtube ')}
+        added = [vid for vid, is_archived in archived.items() if is_archived and vid not in archived_ids]
+
+        removed = len(lines) - len(kept)
+        if removed or added:
+            kept.extend(f"youtube {vid}" for vid in added)
+            temp_file = archive_file.with_name(archive_file.name + '.tmp')
+            with temp_file.open('w', encoding='utf-8', buffering=config.IO_BUFFER_SIZE) as f:
+                f.write('\n'.join(kept))
+                f.write('\n')
+            temp_file.replace(archive_file)
+            log.debug(f"Archive: {len(added)} added, {removed} removed")
+        archived_ids.update(added)
+        return archived_ids
+
+    @staticmethod
+    def _compact_csv(csv_file: Path, statuses: Dict[str, str], archived_ids: Set[str]):
+        """Rewrite the CSV once with the logged statuses, marking archived videos done"""
+        fieldnames, rows, id_col, status_col = read_csv_table(csv_file)
+
+        updated = from_archive = 0
+        for row in rows:
+            vid = row[id_col]
+            status = statuses.get(vid, row[status_col])
+            if vid in archived_ids and status != 'done':
+                status = 'done'
+                from_archive += 1
+            if status != row[status_col]:
+                row[status_col] = status
+                updated += 1
+
+        # Nothing changed and the archive was already in sync: skip the full rewrite
+        if updated == 0:
+            return
+
+        temp_file = csv_file.with_name(csv_file.name + '.tmp')
+        try:
+            with temp_file.open('w', newline='', encoding='utf-8', buffering=config.IO_BUFFER_SIZE) as f:
+                writer = csv.writer(f)
+                writer.writerow(fieldnames)
+                writer.writerows(rows)
+            temp_file.replace(csv_file)
+        except (IOError, OSError):
+            temp_file.unlink(missing_ok=True)
+            raise
+        log.debug(f"Wrote {updated} status update(s) to {csv_file}")
+        if from_archive > 0:
+            log.info(f"Updated {from_archive} videos to 'done' from archive")
+
+journal = Journal(config.JOURNAL_FILE)
+
+def generate_archive_from_csv(done_video_ids: List[str]):
     """Generate archive file from CSV done entries - used for initial setup only"""
     if not config.CSV_FILE.exists():
         return
@@ -289,27 +404,21 @@ def generate_archive_from_csv():
         log.debug("Archive file already exists, skipping regeneration")
         return
 
+    downloaded = scan_output_dir()
     done_ids = []
-    try:
-        with config.CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get('status') == 'done' and row.get('videoId'):
-                    # Only add to archive if file actually exists
-                    if verify_download_exists(row['videoId']):
-                        done_ids.append(f"youtube {row['videoId']}")
-                    else:
-                        log.warning(f"CSV marked as done but file missing, not adding to archive: {row['videoId']}")
-    except Exception as e:
-        log.error(f"Error reading CSV for archive: {e}")
-        return
+    for video_id in done_video_ids:
+        # Only add to archive if file actually exists
+        if verify_download_exists(video_id, downloaded):
+            done_ids.append(f"youtube {video_id}")
+        else:
+            log.warning(f"CSV marked as done but file missing, not adding to archive: {video_id}")
 
     try:
         # Only write if we have valid entries
         if done_ids:
-            with config.ARCHIVE_FILE.open('w', encoding='utf-8') as f:
-                for line in done_ids:
-                    f.write(line + '\n')
+            with config.ARCHIVE_FILE.open('w', encoding='utf-8', buffering=config.IO_BUFFER_SIZE) as f:
+                f.write('\n'.join(done_ids))
+                f.write('\n')
             log.info(f"Generated archive with {len(done_ids)} verified videos")
         else:
             # Create empty archive file
@@ -318,14 +427,13 @@ def generate_archive_from_csv():
     except Exception as e:
         log.error(f"Error writing archive: {e}")
 
-def update_csv_from_archive():
-    """Update CSV from archive with proper file locking"""
-    if not config.ARCHIVE_FILE.exists() or not config.CSV_FILE.exists():
-        return
-
+def load_archived_ids() -> Optional[Set[str]]:
+    """Read the archive into a set of video IDs; None if it cannot be read"""
     archived_ids = set()
+    if not config.ARCHIVE_FILE.exists():
+        return archived_ids
     try:
-        with config.ARCHIVE_FILE.open('r', encoding='utf-8') as f:
+        with config.ARCHIVE_FILE.open('r', encoding='utf-8', buffering=config.IO_BUFFER_SIZE) as f:
             for line in f:
                 line = line.strip()
                 if line.startswith('youtube '):
@@ -333,194 +441,278 @@ def update_csv_from_archive():
                     archived_ids.add(vid)
     except Exception as e:
         log.error(f"Error reading archive: {e}")
-        return
+        return None
+    return archived_ids
 
-    # Use unique temp file name
-    import os
-    pid = os.getpid()
-    timestamp = int(time.time() * 1000000)
-    temp_file = config.CSV_FILE.parent / f'download_temp_archive_{pid}_{timestamp}.csv'
-    
-    updated = 0
+def warm_up_connection(ydl: yt_dlp.YoutubeDL):
+    """Open the HTTPS connection to YouTube once so later requests from this instance reuse it"""
     try:
-        with config.CSV_FILE.open('r+', newline='', encoding='utf-8') as csvfile:
-            # Lock the file for exclusive access
-            fcntl.flock(csvfile.fileno(), fcntl.LOCK_EX)
-            
-            try:
-                csvfile.seek(0)
-                reader = csv.DictReader(csvfile)
-                fieldnames = reader.fieldnames
-                
-                rows = []
-                for row in reader:
-                    vid = row.get('videoId')
-                    if vid in archived_ids and row.get('status') != 'done':
-                        row['status'] = 'done'
-                        updated += 1
-                    rows.append(row)
-                
-                # Write to temp file
-                with temp_file.open('w', newline='', encoding='utf-8') as tempfile:
-                    writer = csv.DictWriter(tempfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(rows)
-                
-                # Atomically replace
-                temp_file.replace(config.CSV_FILE)
-                if updated > 0:
-                    log.info(f"Updated {updated} videos to 'done' from archive")
-                    
-            finally:
-                fcntl.flock(csvfile.fileno(), fcntl.LOCK_UN)
-                
+        ydl.urlopen(yt_dlp.networking.HEADRequest("https://www.youtube.com/")).close()
     except Exception as e:
-        log.error(f"Error updating CSV from archive: {e}")
-    finally:
-        if temp_file.exists():
-            try:
-                temp_file.unlink()
-            except:
-                pass
-
-def download_batch(urls: List[str]) -> Tuple[int, int, List[str]]:
-    if not urls:
-        return 0, 0, []
+        log.debug(f"Connection warm-up failed: {e}")
 
-    ydl_opts = build_yt_dlp_opts()
-    captcha_challenged_urls = []
-    
-    log.info(f"Batch processing: {len(urls)} videos")
-
-    success = 0
-    
-    for url in urls:
-        video_id = url.split('v=')[-1].split('&')[0]
+def record_download_result(video_id: str, status: str):
+    """Journal a status reported by a download worker, and the matching archive change"""
+    journal.status(video_id, status)
+    if status == "done":
+        journal.archive(video_id)  # Workers only report done after verifying the file
+    else:
+        journal.unarchive(video_id)
+
+# YoutubeDL owned by the current worker process, reused (with its connection pool and cookie jar)
+# across downloads. Every YDL_ROTATE_AFTER downloads, or after a download error, new options are
+# rolled; the instance is only replaced when the (cookie file, client) pair actually changes.
+_worker_ydl: Optional[yt_dlp.YoutubeDL] = None
+_worker_ydl_key: Optional[Tuple[Optional[str], str]] = None
+_worker_ydl_uses = 0
+
+def retire_worker_ydl():
+    """Force get_worker_ydl to re-roll cookies and client before the next download"""
+    global _worker_ydl_uses
+    _worker_ydl_uses = config.YDL_ROTATE_AFTER
+
+def get_worker_ydl() -> yt_dlp.YoutubeDL:
+    global _worker_ydl, _worker_ydl_key, _worker_ydl_uses
+    if _worker_ydl is None or _worker_ydl_uses >= config.YDL_ROTATE_AFTER:
+        opts = build_yt_dlp_opts()
+        key = (opts.get("cookiefile"), opts["extractor_args"]["youtube"]["innertube_client"])
+        if _worker_ydl is None or key != _worker_ydl_key:
+            if _worker_ydl is not None:
+                try:
+                    _worker_ydl.close()
+                except Exception as e:
+                    log.debug(f"Error closing previous YoutubeDL: {e}")
+            _worker_ydl = yt_dlp.YoutubeDL(opts)
+            _worker_ydl_key = key
+            warm_up_connection(_worker_ydl)
+        _worker_ydl_uses = 0
+    _worker_ydl_uses += 1
+    return _worker_ydl
+
+def _download_once(ydl_opts: dict, url: str):
+    """Download a URL with a short-lived YoutubeDL, for retries that need a fresh connection"""
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ydl.download([url])
+
+# One case-insensitive scan of a DownloadError message; matched keywords map to an error kind
+_ERROR_RE = re.compile(r'captcha|challenge|ssl|eof|connection|unavailable', re.IGNORECASE)
+_ERROR_KINDS = {
+    "captcha": "captcha", "challenge": "captcha",
+    "ssl": "connection", "eof": "connection", "connection": "connection",
+    "unavailable": "unavailable",
+}
+_ERROR_PRIORITY = ("captcha", "connection", "unavailable")  # When a message matches several kinds
+
+# kind -> (status, log level, log message, retry once with a fresh connection)
+_ERROR_ACTIONS = {
+    "captcha": ("captcha_challenge", logging.WARNING, "Captcha challenge detected for {video_id}", False),
+    "connection": ("ssl_retry", logging.WARNING, "SSL/Connection error for {video_id} (VPN related)", True),
+    "unavailable": ("unavailable", logging.WARNING, "Video {video_id} is unavailable", False),
+}
+_DEFAULT_ERROR_ACTION = ("failed", logging.ERROR, "Error downloading {video_id}", False)
+
+def classify_download_error(error_message: str) -> Optional[str]:
+    """Return the error kind for a DownloadError message, or None if it is not recognized"""
+    kinds = {_ERROR_KINDS[m.lower()] for m in _ERROR_RE.findall(error_message)}
+    for kind in _ERROR_PRIORITY:
+        if kind in kinds:
+            return kind
+    return None
+
+def download_one(video_id: str, url: str) -> Tuple[str, str]:
+    """
+    Download a single video in a worker process.
+
+    Workers never touch the CSV or archive; the resulting (video_id, status)
+    is returned and applied by the parent via record_download_result.
+    """
+    try:
+        get_worker_ydl().download([url])
+        
+        # Verify file actually exists before marking as done
+        if verify_download_exists(video_id):
+            log.info(f"Successfully downloaded: {video_id}")
+            return video_id, "done"
+        log.error(f"Download claimed success but file not found: {video_id}")
+        return video_id, "failed"
             
-        update_csv_status(video_id, "in_progress")
+    except yt_dlp.utils.DownloadError as e:
+        retire_worker_ydl()  # Don't keep hitting YouTube with the cookies/client that just failed
+        error_message = str(e)
+        status, level, message, retry = _ERROR_ACTIONS.get(classify_download_error(error_message), _DEFAULT_ERROR_ACTION)
+        log.log(level, f"{message.format(video_id=video_id)}: {error_message}")
+        if not retry:
+            return video_id, status
+        log.info(f"Retrying {video_id} in 10 seconds due to VPN connection issue...")
+        time.sleep(10)  # Wait longer for VPN to stabilize
         
+        # Retry once with fresh connection
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                
-                if urls.index(url) > 0:
-                    random_delay = random.uniform(1.0, 3.0)
-                    log.debug(f"Random delay of {random_delay:.1f}s before downloading next URL")
-                    time.sleep(random_delay)
-                
-                ydl.download([url])
-                
-                # Verify file actually exists before marking as done
-                if verify_download_exists(video_id):
-                    success += 1
-                    update_csv_status(video_id, "done")
-                    add_to_archive(video_id)  # Only add to archive after verification
-                    log.info(f"Successfully downloaded: {video_id}")
-                else:
-                    log.error(f"Download claimed success but file not found: {video_id}")
-                    update_csv_status(video_id, "failed")
-                    remove_from_archive(video_id)
-                
-        except yt_dlp.utils.DownloadError as e:
-            error_message = str(e)
-            if "captcha" in error_message.lower() or "challenge" in error_message.lower():
-                log.warning(f"Captcha challenge detected for {video_id}: {error_message}")
-                captcha_challenged_urls.append(url)
-                update_csv_status(video_id, "captcha_challenge")
-                remove_from_archive(video_id)
-            elif "ssl" in error_message.lower() or "eof" in error_message.lower() or "connection" in error_message.lower():
-                log.warning(f"SSL/Connection error for {video_id} (VPN related): {error_message}")
-                log.info(f"Retrying {video_id} in 10 seconds due to VPN connection issue...")
-                time.sleep(10)  # Wait longer for VPN to stabilize
-                
-                # Retry once with fresh connection
-                try:
-                    with yt_dlp.YoutubeDL(build_yt_dlp_opts()) as retry_ydl:
-                        retry_ydl.download([url])
-                        if verify_download_exists(video_id):
-                            success += 1
-                            update_csv_status(video_id, "done")
-                            add_to_archive(video_id)
-                            log.info(f"Successfully downloaded on retry: {video_id}")
-                        else:
-                            log.warning(f"Retry failed for {video_id}, will try again later")
-                            update_csv_status(video_id, "ssl_retry")  # Special status for SSL issues
-                            remove_from_archive(video_id)
-                except Exception as retry_e:
-                    log.warning(f"Retry also failed for {video_id}: {str(retry_e)}")
-                    update_csv_status(video_id, "ssl_retry")  # Mark for later retry instead of failed
-                    remove_from_archive(video_id)
-            elif "unavailable" in error_message.lower():
-                log.warning(f"Video {video_id} is unavailable: {error_message}")
-                update_csv_status(video_id, "unavailable")
-                remove_from_archive(video_id)
-            else:
-                log.error(f"Error downloading {video_id}: {error_message}")
-                update_csv_status(video_id, "failed")
-                remove_from_archive(video_id)
-        except Exception as e:
-            log.error(f"Unexpected error downloading {video_id}: {str(e)}")
-            update_csv_status(video_id, "failed")
-            remove_from_archive(video_id)
-    
-    fail = len(urls) - success
-    
-    if fail > 0:
-        log.warning(f"Batch finished with {fail} failure(s), {len(captcha_challenged_urls)} captcha challenges")
-    else:
-        log.info("Batch completed successfully with no failures")
+            _download_once(build_yt_dlp_opts(), url)
+            if verify_download_exists(video_id):
+                log.info(f"Successfully downloaded on retry: {video_id}")
+                return video_id, "done"
+            log.warning(f"Retry failed for {video_id}, will try again later")
+            return video_id, "ssl_retry"  # Special status for SSL issues
+        except Exception as retry_e:
+            log.warning(f"Retry also failed for {video_id}: {str(retry_e)}")
+            return video_id, "ssl_retry"  # Mark for later retry instead of failed
+    except Exception as e:
+        log.error(f"Unexpected error downloading {video_id}: {str(e)}")
+        return video_id, "failed"
+
+def pace_start(last_start: float) -> float:
+    """Keep a human-like 1-3s gap between starts, but only when the last one was under a second ago"""
+    since_last = time.time() - last_start
+    if since_last < 1.0:
+        random_delay = random.uniform(1.0, 3.0) - since_last
+        log.debug(f"Random delay of {random_delay:.1f}s before starting next URL")
+        time.sleep(random_delay)
+    return time.time()
+
+# Metadata-only YoutubeDL per probe thread; every instance is also kept in _probe_ydls
+# so prune_unavailable can close them once its pool is done
+_probe_local = threading.local()
+_probe_ydls: List[yt_dlp.YoutubeDL] = []
+_probe_ydls_lock = threading.Lock()
+
+def probe_video(video_id: str, url: str) -> Tuple[str, bool]:
+    """Extract metadata without downloading; returns (video_id, False) only if the video is unavailable"""
+    ydl = getattr(_probe_local, "ydl", None)
+    if ydl is None:
+        opts = build_yt_dlp_opts()
+        opts.update({"skip_download": True, "ignoreerrors": False})
+        ydl = _probe_local.ydl = yt_dlp.YoutubeDL(opts)
+        with _probe_ydls_lock:
+            _probe_ydls.append(ydl)
+    try:
+        ydl.extract_info(url, download=False)
+    except yt_dlp.utils.DownloadError as e:
+        # Anything other than a dead video (captcha, VPN hiccup) is left for the download attempt
+        if classify_download_error(str(e)) == "unavailable":
+            log.warning(f"Video {video_id} is unavailable: {e}")
+            return video_id, False
+    except Exception as e:
+        log.debug(f"Metadata probe failed for {video_id}: {e}")
+    return video_id, True
+
+def prune_unavailable(urls: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Probe a batch of URLs concurrently, mark dead ones unavailable, and return the rest in order"""
+    try:
+        with ThreadPoolExecutor(max_workers=config.PROBE_WORKERS) as probe_pool:
+            # Probe starts are paced like download starts, so the probe pass stays human-like too
+            futures = []
+            last_start = 0.0
+            for video_id, url in urls:
+                last_start = pace_start(last_start)
+                futures.append(probe_pool.submit(probe_video, video_id, url))
+            results = dict(future.result() for future in futures)
+    finally:
+        with _probe_ydls_lock:
+            for ydl in _probe_ydls:
+                ydl.close()
+            _probe_ydls.clear()
+
+    unavailable = [vid for vid, available in results.items() if not available]
+    for vid in unavailable:
+        record_download_result(vid, "unavailable")
+    if unavailable:
+        log.info(f"Skipping {len(unavailable)} unavailable videos found by the metadata probe")
+    return [(vid, url) for vid, url in urls if results[vid]]
 
-    return success, fail, captcha_challenged_urls
+def get_worker_count() -> int:
+    return min(config.MAX_WORKERS, os.cpu_count() or 1)
 
 def main(channel_id: Optional[str] = None):
     if not config.CSV_FILE.exists():
         log.error(f"CSV file not found: {config.CSV_FILE}")
         sys.exit(1)
 
-    generate_archive_from_csv()
+    # A journal left behind by an interrupted run holds results the CSV and archive have not seen yet
+    if journal.path.exists():
+        log.info(f"Merging {journal.path} left by an interrupted run")
+        journal.compact_into(config.CSV_FILE, config.ARCHIVE_FILE)
 
     try:
-        with config.CSV_FILE.open(newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = [row for row in reader if row.get('videoId')]
-            if channel_id:
-                rows = [row for row in rows if row.get('channelId') == channel_id]
-            video_ids = [row['videoId'] for row in rows if row.get('status') not in ['done', 'unavailable']]
-            urls = [f"https://www.youtube.com/watch?v={vid}" for vid in video_ids]
-            random.shuffle(urls)
-            log.info(f"Found {len(urls)} videos to download." + (f" for channel {channel_id}" if channel_id else ""))
+        load_csv_index()
     except Exception as e:
         log.error(f"CSV read error: {e}")
         sys.exit(1)
 
+    # Single pass over the rows: done ids seed the archive, the rest are download candidates
+    channel_col = _fieldnames.index('channelId') if 'channelId' in _fieldnames else None
+    done_video_ids = []
+    video_ids = []
+    for vid, row in _csv_index.items():
+        status = row[_status_col]
+        if status == 'done':
+            done_video_ids.append(vid)
+        if channel_id and (channel_col is None or row[channel_col] != channel_id):
+            continue
+        if status not in ('done', 'unavailable'):
+            video_ids.append(vid)
+
+    generate_archive_from_csv(done_video_ids)
+
+    # Videos already in the archive are skipped even if their CSV row is stale;
+    # Journal.compact_into marks them done at the end of the run
+    archived_ids = load_archived_ids() or set()
+    pending_count = len(video_ids)
+    video_ids = [vid for vid in video_ids if vid not in archived_ids]
+    if len(video_ids) < pending_count:
+        log.info(f"Skipping {pending_count - len(video_ids)} videos already in the archive")
+
+    urls = [(vid, f"https://www.youtube.com/watch?v={vid}") for vid in video_ids]
+    random.shuffle(urls)
+    log.info(f"Found {len(urls)} videos to download." + (f" for channel {channel_id}" if channel_id else ""))
+
     if not urls:
         log.info("No new videos to download." + (f" for channel {channel_id}" if channel_id else ""))
         return
 
     start_time = time.time()
-    total_success = total_fail = 0
-
-    with ThreadPoolExecutor(max_workers=4) as executor:  # Adjust max_workers as needed
-        futures = []
-        i = 0
-        batch_num = 1
-        while i < len(urls):
-            batch_size = random.randint(8, 16)
-            batch_urls = urls[i:i + batch_size]
-            if not batch_urls:
-                break
-            log.info(f"--- Submitting batch {batch_num} ({len(batch_urls)} videos) ---")
-            futures.append(executor.submit(download_batch, batch_urls))
-            i += len(batch_urls)
-            batch_num += 1
-        
-        for future in as_completed(futures):
-            success, fail, captcha_challenged_urls = future.result()
-            total_success += success
-            total_fail += fail
-            log.info(f"Batch completed: {success} downloaded, {fail} failed.")
+    status_counts = {}
+
+    def collect(futures) -> None:
+        for future in futures:
+            video_id, status = future.result()
+            record_download_result(video_id, status)
+            status_counts[status] = status_counts.get(status, 0) + 1
 
-    update_csv_from_archive()
+    # Each URL is its own task, so up to `workers` downloads run at once. Separate processes
+    # keep yt-dlp's extractor work off a shared GIL; more processes than cores would just contend for CPU.
+    workers = get_worker_count()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_logging,
+                                 initargs=(_log_queue,)) as executor:
+            in_flight = set()
+            last_start = 0.0
+            for batch_start in range(0, len(urls), config.PROBE_BATCH_SIZE):
+                batch = urls[batch_start:batch_start + config.PROBE_BATCH_SIZE]
+                # Dead videos are pruned batch by batch, right before they would take a download slot
+                if config.PROBE_WORKERS > 0:
+                    probed = prune_unavailable(batch)
+                    status_counts["unavailable"] = status_counts.get("unavailable", 0) + len(batch) - len(probed)
+                    batch = probed
+
+                for video_id, url in batch:
+                    # Only queue as many tasks as there are workers, so the pacing below spaces out real download starts
+                    if len(in_flight) >= workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+
+                    last_start = pace_start(last_start)
+                    in_flight.add(executor.submit(download_one, video_id, url))
+
+            collect(as_completed(in_flight))
+    finally:
+        # One rewrite each of the CSV and the archive, even if the run was interrupted
+        journal.compact_into(config.CSV_FILE, config.ARCHIVE_FILE)
 
+    total_success = status_counts.get("done", 0)
+    total_fail = sum(status_counts.values()) - total_success
+    if status_counts.get("captcha_challenge"):
+        log.warning(f"{status_counts['captcha_challenge']} captcha challenge(s) during this run")
     runtime = (time.time() - start_time) / 60
     log.info(f"=== Download Complete: {total_success} success, {total_fail} failed in {runtime:.1f} minutes ===")
 
@@ -529,8 +721,9 @@ if __name__ == "__main__":
     parser.add_argument('--channel-id', type=str, help='Optional channel ID to filter videos by.')
     args = parser.parse_args()    
     
+    _log_listener.start()
     log.info(f"Download configuration: Output directory={config.OUTPUT_DIR}")
-    log.info(f"Batch size: {config.BATCH_DOWNLOAD_SIZE}")
+    log.info(f"Concurrent downloads: {get_worker_count()}")
     
     try:
         main(channel_id=args.channel_id)
@@ -539,4 +732,5 @@ if __name__ == "__main__":
     except Exception as e:
         log.error(f"Unhandled exception: {e}")
     finally:
-        log.info("Download process completed or terminated")
\ No newline at end of file
+        log.info("Download process completed or terminated")
+        _log_listener.stop()
\ No newline at end of file
@@ -1,18 +1,21 @@
 import os
 import sys
 import csv
+import re
 import time
 import random
 import logging
 import argparse
+import atexit
 import threading
-import fcntl  # For multi-process file locking
+import queue
 import uuid
+import functools
 import numpy as np
 from pathlib import Path
-from typing import List, Tuple, Optional, Callable
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from contextlib import contextmanager
+from typing import Dict, List, Set, Tuple, Optional, Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import ExitStack, contextmanager
 from enum import Enum
 import yt_dlp
 from dataclasses import dataclass
@@ -36,18 +39,23 @@ class VideoStatus(str, Enum):
 class Config:
     CSV_FILE: Path = Path("output/download.csv")  # FIXED: Correct path
     OUTPUT_DIR: Path = Path.home() / "Downloads" / "YouTube"
-    CONCURRENT_FRAGMENTS: int = 8  # Reduced for stability
+    CONCURRENT_FRAGMENTS: int = 4  # Starting value; adjusted per batch by ConcurrencyController
+    CONCURRENT_FRAGMENTS_LIMIT: int = 8
     MIN_BATCH_SIZE: int = 4        # Smaller batches
     MAX_BATCH_SIZE: int = 8        # More human-like
     cookies_dir: Path = Path("input/Cookies")
     ARCHIVE_FILE: Path = Path("output/download_archive.txt")
     SLEEP_MIN: float = 3.0
     SLEEP_MAX: float = 12.0         # Increased range for more human-like
-    MAX_WORKERS: int = 2           # Reduced workers
+    MAX_WORKERS: int = 2           # Download slots shared by all batches; starting value, adjusted per batch by ConcurrencyController
+    MAX_WORKERS_LIMIT: int = 8
     FRAGMENT_RETRIES: int = 10     # More retries
     RETRIES: int = 5               # More retries
     BATCH_PAUSE_MEAN: float = 30.0 # Increased mean pause between batches
     BATCH_PAUSE_STD: float = 15.0   # Increased standard deviation
+    CSV_FLUSH_INTERVAL: float = 10.0  # Seconds between CSV rewrites by the status writer thread
+    MULTI_PROCESS: bool = False    # Set when several downloader processes share the CSV; enables file locks
+    STATUS_DELTA_DIR: Path = Path("output/status_deltas")  # Per-process status logs merged by the leader
 
 config = Config()
 
@@ -85,6 +93,81 @@ ACCEPT_LANGUAGES = ["en-US,en;q=0.9", "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7", "de
                     "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7", "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7"]
 YOUTUBE_CLIENTS = ["web", "mweb", "android", "ios"]  # More stable clients
 
+# Cross-process locking, picked by platform at import time: fcntl on POSIX, msvcrt on
+# Windows, nothing if neither is available
+try:
+    import fcntl
+
+    def _lock_file(fh, blocking: bool = True) -> bool:
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock_file(fh):
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+except ImportError:
+    try:
+        import msvcrt
+
+        def _lock_file(fh, blocking: bool = True) -> bool:
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                    return True
+                except OSError:
+                    if not blocking:
+                        return False
+                    time.sleep(0.1)
+
+        def _unlock_file(fh):
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+    except ImportError:
+        def _lock_file(fh, blocking: bool = True) -> bool:
+            return True
+
+        def _unlock_file(fh):
+            pass
+
+class _FileLock:
+    """
+    Exclusive lock on a sidecar file, shared across processes. Does nothing unless
+    config.MULTI_PROCESS is set, so a single downloader pays no locking syscalls.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not config.MULTI_PROCESS:
+            return True
+        fh = self.path.open('a+')
+        if not _lock_file(fh, blocking):
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def release(self):
+        if self._fh is not None:
+            _unlock_file(self._fh)
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def csv_file_lock() -> _FileLock:
+    return _FileLock(config.CSV_FILE.with_name(config.CSV_FILE.name + '.lock'))
+
 @contextmanager
 def atomic_csv_update(csv_file: Path):
     """Thread-safe atomic CSV update with unique temp file naming"""
@@ -97,41 +180,104 @@ def atomic_csv_update(csv_file: Path):
             temp_file.unlink()
         raise
 
-def verify_downloaded_file(video_id: str, additional_dirs: List[Path] = None) -> bool:
-    """Verify that a video file was actually downloaded successfully"""
-    possible_extensions = ['.mp4', '.webm', '.mkv', '.m4a', '.mp3']
-    
-    # Check main download directory
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.m4a', '.mp3')
+
+# video_id -> path of every verified (>1KB) video file, filled by one os.scandir sweep per directory
+_download_index: Dict[str, Path] = {}
+_indexed_dirs: Set[Path] = set()
+
+def build_download_index(dirs: List[Path]) -> Dict[str, Path]:
+    """Map video_id -> file path for all video files larger than 1KB in the given directories"""
+    index = {}
+    for search_dir in dirs:
+        try:
+            with os.scandir(search_dir) as entries:
+                for entry in entries:
+                    video_id, ext = os.path.splitext(entry.name)
+                    if ext in VIDEO_EXTENSIONS and entry.is_file() and entry.stat().st_size > 1024:
+                        index.setdefault(video_id, Path(entry.path))
+        except OSError as e:
+            log.warning(f"Could not scan {search_dir}: {e}")
+    return index
+
+def _index_search_dirs(additional_dirs: List[Path] = None) -> List[Path]:
+    """Add OUTPUT_DIR and any additional directories to the download index if not indexed yet"""
     search_dirs = [config.OUTPUT_DIR]
-    
-    # Add additional directories if provided
     if additional_dirs:
         search_dirs.extend(additional_dirs)
-    
+
+    new_dirs = [d for d in search_dirs if d not in _indexed_dirs]
+    if new_dirs:
+        for vid, path in build_download_index(new_dirs).items():
+            _download_index.setdefault(vid, path)
+        _indexed_dirs.update(new_dirs)
+    return search_dirs
+
+def get_done_ids_set(additional_dirs: List[Path] = None) -> Set[str]:
+    """IDs of every verified downloaded file, taken from the download index"""
+    _index_search_dirs(additional_dirs)
+    return set(_download_index)
+
+def verify_downloaded_file(video_id: str, additional_dirs: List[Path] = None, check_disk: bool = False) -> bool:
+    """
+    Verify that a video file was actually downloaded successfully.
+
+    Answers from the download index; pass check_disk=True right after a download,
+    when the new file is not indexed yet.
+    """
+    search_dirs = _index_search_dirs(additional_dirs)
+    if video_id in _download_index:
+        return True
+    if not check_disk:
+        return False
+
     for search_dir in search_dirs:
-        for ext in possible_extensions:
+        for ext in VIDEO_EXTENSIONS:
             file_path = search_dir / f"{video_id}{ext}"
             if file_path.exists() and file_path.stat().st_size > 1024:  # At least 1KB
                 log.debug(f"Verified downloaded file: {file_path}")
+                _download_index[video_id] = file_path
                 return True
     return False
 
 def extract_video_id(url: str) -> str:
     return url.split('v=')[-1].split('&')[0]
 
+# Per-thread numpy Generator plus a buffer of pre-drawn standard normals, so sleep sampling
+# is an array read instead of a global-RNG call and threads never share RNG state
+_rng_local = threading.local()
+SAMPLE_BUFFER_SIZE = 4096
+
+def _thread_rng() -> np.random.Generator:
+    rng = getattr(_rng_local, "rng", None)
+    if rng is None:
+        rng = _rng_local.rng = np.random.default_rng()
+    return rng
+
+def _next_sample(mean: float, std: float) -> float:
+    """Next N(mean, std) sample, taken from this thread's buffer of standard normals"""
+    normals = getattr(_rng_local, "normals", None)
+    pos = getattr(_rng_local, "pos", 0)
+    if normals is None or pos >= len(normals):
+        normals = _rng_local.normals = _thread_rng().standard_normal(SAMPLE_BUFFER_SIZE)
+        pos = 0
+    _rng_local.pos = pos + 1
+    return mean + std * float(normals[pos])
+
 def human_sleep(base_time: float = 5.0, variation: float = 3.0, min_time: float = 2.0) -> float:
     """Generate human-like sleep time using Gaussian distribution with occasional longer breaks"""
     # 10% chance of much longer break (simulating user distraction)
-    if random.random() < 0.10:
-        sleep_time = np.random.normal(45.0, 15.0)  # Long break like user switching tasks
+    rng = _thread_rng()
+    if rng.random() < 0.10:
+        sleep_time = _next_sample(45.0, 15.0)  # Long break like user switching tasks
         sleep_time = max(10.0, sleep_time)
         log.debug(f"Taking long human break: {sleep_time:.1f} seconds")
     else:
-        sleep_time = np.random.normal(base_time, variation)
+        sleep_time = _next_sample(base_time, variation)
         sleep_time = max(min_time, sleep_time)  # Ensure minimum
     
     # Add small random jitter
-    jitter = random.uniform(-0.5, 0.5)
+    jitter = rng.uniform(-0.5, 0.5)
     sleep_time += jitter
     sleep_time = max(min_time, sleep_time)
     
@@ -139,41 +285,101 @@ def human_sleep(base_time: float = 5.0, variation: float = 3.0, min_time: float
     time.sleep(sleep_time)
     return sleep_time
 
+class ConcurrencyController:
+    """
+    AIMD tuning of MAX_WORKERS and CONCURRENT_FRAGMENTS from each batch's success rate.
+
+    MAX_WORKERS is the number of download slots handed out by download_slot() across all
+    batches, so it bounds the run's concurrent requests directly. Healthy batches (>90%
+    success) add one slot/fragment; degraded ones (<50%) halve both, which halves the
+    downloads in flight as running ones finish, and double the pause between batches
+    until the link recovers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slot_free = threading.Condition(self.lock)
+        self.running = 0
+        self.pause_factor = 1.0
+
+    @contextmanager
+    def download_slot(self):
+        """Hold one of the MAX_WORKERS download slots shared by all batches; waits while the tuned limit is reached"""
+        with self.slot_free:
+            self.slot_free.wait_for(lambda: self.running < config.MAX_WORKERS)
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self.slot_free:
+                self.running -= 1
+                self.slot_free.notify_all()
+
+    def record(self, success: int, fail: int):
+        total = success + fail
+        if total == 0:
+            return
+        success_rate = success / total
+        with self.lock:
+            workers, fragments = config.MAX_WORKERS, config.CONCURRENT_FRAGMENTS
+            if success_rate > 0.9:
+                config.MAX_WORKERS = min(workers + 1, config.MAX_WORKERS_LIMIT)
+                config.CONCURRENT_FRAGMENTS = min(fragments + 1, config.CONCURRENT_FRAGMENTS_LIMIT)
+                self.pause_factor = 1.0
+            elif success_rate < 0.5:
+                config.MAX_WORKERS = max(1, workers // 2)
+                config.CONCURRENT_FRAGMENTS = max(1, fragments // 2)
+                self.pause_factor = min(self.pause_factor * 2, 8.0)
+            if (config.MAX_WORKERS, config.CONCURRENT_FRAGMENTS) != (workers, fragments):
+                self.slot_free.notify_all()  # A raised limit frees download slots
+                log.info(f"Success rate {success_rate:.0%}: download slots {workers} -> {config.MAX_WORKERS}, "
+                         f"fragments {fragments} -> {config.CONCURRENT_FRAGMENTS}, pause x{self.pause_factor:.0f}")
+
+concurrency = ConcurrencyController()
+
 def batch_pause() -> float:
-    """Generate pause between batches with occasional longer breaks and human-like patterns"""
+    """Pick the pause before the next batch starts, with occasional longer breaks and human-like patterns"""
+    rng = _thread_rng()
     # 20% chance of longer break (human-like browsing behavior)
-    if random.random() < 0.20:
-        pause_time = np.random.normal(120, 45)  # ~2 min break (user checking other sites)
+    if rng.random() < 0.20:
+        pause_time = _next_sample(120, 45)  # ~2 min break (user checking other sites)
         pause_time = max(45, pause_time)
         log.info(f"Taking extended browsing break: {pause_time:.0f}s")
     # 5% chance of very long break (user taking a call, eating, etc.)
-    elif random.random() < 0.05:
-        pause_time = np.random.normal(300, 120)  # ~5 min break
+    elif rng.random() < 0.05:
+        pause_time = _next_sample(300, 120)  # ~5 min break
         pause_time = max(120, pause_time)
         log.info(f"Taking very long break: {pause_time:.0f}s")
     else:
-        pause_time = np.random.normal(config.BATCH_PAUSE_MEAN, config.BATCH_PAUSE_STD)
+        pause_time = _next_sample(config.BATCH_PAUSE_MEAN, config.BATCH_PAUSE_STD)
         pause_time = max(10, pause_time)
     
     # Add random jitter
-    jitter = random.uniform(-5, 5)
+    jitter = rng.uniform(-5, 5)
     pause_time += jitter
-    pause_time = max(5, pause_time)
-    
-    time.sleep(pause_time)
+    pause_time = max(5, pause_time) * concurrency.pause_factor  # Back off further while batches are failing
     return pause_time
 
-def progress_hook(d):
-    if d['status'] == 'finished':
-        log.info(f"[DOWNLOAD FINISHED] {d['filename']}")
-    elif d['status'] == 'error':
-        log.error(f"[DOWNLOAD ERROR] {d.get('filename', 'unknown')}: {d.get('error', 'unknown error')}")
+def make_progress_hook():
+    """Build the yt-dlp progress hook with the loggers bound once; it fires on every fragment"""
+    info, error = log.info, log.error
+
+    def progress_hook(d):
+        status = d['status']
+        if status == 'downloading':  # By far the most frequent callback; nothing to log
+            return
+        if status == 'finished':
+            info(f"[DOWNLOAD FINISHED] {d['filename']}")
+        elif status == 'error':
+            error(f"[DOWNLOAD ERROR] {d.get('filename', 'unknown')}: {d.get('error', 'unknown error')}")
+
+    return progress_hook
 
 def build_yt_dlp_opts(disable_proxy: bool = False) -> dict:
     opts = {
         "outtmpl": str(config.OUTPUT_DIR / "%(id)s.%(ext)s"),
         "format_sort": ["+size", "+br", "+res", "+fps"],
-        "concurrent_fragments": min(config.CONCURRENT_FRAGMENTS, 4),  # Reduced for stability
+        "concurrent_fragments": config.CONCURRENT_FRAGMENTS,
         "sleep_interval": random.uniform(config.SLEEP_MIN, config.SLEEP_MAX) + random.uniform(0.5, 2.0),
         "max_sleep_interval": random.uniform(config.SLEEP_MIN * 1.5, config.SLEEP_MAX * 1.5) + random.uniform(1.0, 4.0),
         "retries": 10,  # Increased for SSL issues
@@ -184,7 +390,7 @@ def build_yt_dlp_opts(disable_proxy: bool = False) -> dict:
         "quiet": True,
         "no_warnings": True,
         # Removed download_archive to prevent overwriting existing entries
-        "progress_hooks": [progress_hook],
+        "progress_hooks": [make_progress_hook()],
         "user_agent": random.choice(USER_AGENTS),
         "nocheckcertificate": True,  # Disable SSL certificate verification to avoid SSL errors
         "http_headers": {
@@ -224,43 +430,72 @@ def build_yt_dlp_opts(disable_proxy: bool = False) -> dict:
     
     return opts
 
-def is_cookie_file_valid(cookie_file: Path) -> bool:
-    """Enhanced cookie validation with expiration check"""
-    if not cookie_file.exists() or cookie_file.stat().st_size < 10:
-        return False
-    
-    current_time = int(time.time())
-    
+_COOKIE_DOMAIN_RE = re.compile(rb'youtube\.com|\.google\.com')
+
+@functools.lru_cache(maxsize=64)
+def _cookie_valid(path_str: str, mtime_ns: int) -> bool:
+    """Check the head of a cookie file for YouTube domains; cached per (path, mtime)"""
     try:
-        with open(cookie_file, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(path_str, 'rb') as f:
             content = f.read(1024)
-            youtube_domains = ['youtube.com', '.google.com']
-            has_youtube = any(domain in content for domain in youtube_domains)
-            
-            # Basic validation for YouTube domains
-            if not has_youtube:
-                return False
-                
-            return True
-            
-    except Exception as e:
-        log.warning(f"Error validating cookie file {cookie_file}: {e}")
+    except OSError as e:
+        log.warning(f"Error validating cookie file {path_str}: {e}")
+        return False
+    # Basic validation for YouTube domains
+    return _COOKIE_DOMAIN_RE.search(content) is not None
+
+def is_cookie_file_valid(cookie_file: Path) -> bool:
+    """Cookie validation, re-reading the file only when its mtime changes"""
+    try:
+        st = cookie_file.stat()
+    except OSError:
         return False
+    if st.st_size < 10:
+        return False
+    return _cookie_valid(str(cookie_file), st.st_mtime_ns)
 
-def get_cookies_files() -> List[Path]:
-    if not config.cookies_dir.exists():
-        return []
-    return [f for f in config.cookies_dir.glob("*.txt") if f.is_file()]
+@functools.lru_cache(maxsize=1)
+def _cookie_choices(cookies_dir: Path, entries: Tuple[Tuple[str, int, int], ...]) -> Tuple[Tuple[Path, ...], Optional[np.ndarray]]:
+    """Valid cookie files, newest first, with their selection probabilities"""
+    # entries are (name, mtime_ns, size) of every *.txt file in cookies_dir
+    valid = [(mtime_ns, name) for name, mtime_ns, size in entries
+             if size >= 10 and _cookie_valid(str(cookies_dir / name), mtime_ns)]
+    if not valid:
+        return (), None
+    valid.sort(reverse=True)
+    valid_files = [cookies_dir / name for _, name in valid]
+    n = len(valid_files)
+    # Newest file ~50%, second ~30%, the rest share the remaining 20%
+    if n > 2:
+        weights = np.array([0.5, 0.3] + [0.2 / (n - 2)] * (n - 2))
+    elif n == 2:
+        weights = np.array([0.67, 0.33])
+    else:
+        weights = np.array([1.0])
+    return tuple(valid_files), weights / weights.sum()
+
+def get_cookie_choices() -> Tuple[Tuple[Path, ...], Optional[np.ndarray]]:
+    """Cookie files and weights, rebuilt only when a cookie file is added, removed or rewritten"""
+    entries = []
+    try:
+        # One scandir per call; files refreshed in place change their own mtime but not the directory's
+        with os.scandir(config.cookies_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.txt') and entry.is_file():
+                    st = entry.stat()
+                    entries.append((entry.name, st.st_mtime_ns, st.st_size))
+    except OSError:
+        return (), None
+    entries.sort()
+    return _cookie_choices(config.cookies_dir, tuple(entries))
 
 def rotate_cookies() -> Optional[str]:
-    valid_files = [f for f in get_cookies_files() if is_cookie_file_valid(f)]
+    valid_files, weights = get_cookie_choices()
     if not valid_files:
         log.info("No valid cookie files found")
         return None
     
-    valid_files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
-    weights = [0.5, 0.3] + [0.2 / max(1, len(valid_files) - 2)] * (len(valid_files) - 2) if len(valid_files) > 2 else ([0.67, 0.33] if len(valid_files) == 2 else [1.0])
-    selected = random.choices(valid_files, weights=weights[:len(valid_files)])[0]
+    selected = valid_files[_thread_rng().choice(len(valid_files), p=weights)]
     log.info(f"Selected cookie file: {selected.name} (one of {len(valid_files)} valid files)")
     return str(selected)
 
@@ -272,34 +507,45 @@ def get_cookies_config() -> dict:
     log.warning("No valid cookie sources available. Bot detection likely.")
     return {}
 
-def modify_csv_rows(modifier_func: Callable[[dict], dict]) -> int:
-    """Thread-safe CSV modification with improved error handling"""
+def modify_csv_rows(modifier_func: Callable[[str, str], str], filter_ids: Optional[Set[str]] = None) -> int:
+    """
+    Apply modifier_func(video_id, status) -> status to the in-memory CSV store and write it back once.
+
+    If filter_ids is given, modifier_func only runs for those videos. Must not be called
+    while the status writer thread is running. With MULTI_PROCESS, the CSV is only rewritten
+    when no other process is the CSV leader; otherwise the changes go to this process's
+    delta log, for the leader to merge on its next flush.
+    """
     if not config.CSV_FILE.exists():
         return 0
     
+    modified_count = 0
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            with csv_lock, atomic_csv_update(config.CSV_FILE) as temp_file:
-                modified_count = 0
-                with config.CSV_FILE.open('r', newline='', encoding='utf-8') as infile, \
-                     temp_file.open('w', newline='', encoding='utf-8') as outfile:
-                    reader = csv.DictReader(infile)
-                    fieldnames = reader.fieldnames
-                    if fieldnames and 'status' not in fieldnames:
-                        fieldnames.append('status')
-                    
-                    writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    
-                    for row in reader:
-                        original_row = row.copy()
-                        modified_row = modifier_func(row)
-                        if modified_row != original_row:
-                            modified_count += 1
-                        writer.writerow(modified_row)
-                        
-                return modified_count
+            with csv_lock, csv_file_lock():
+                # Other processes may have rewritten the CSV since it was loaded; a reload
+                # drops whatever an earlier attempt changed, so counting starts over
+                if config.MULTI_PROCESS or not csv_store.loaded:
+                    csv_store.load()
+                    modified_count = 0
+                modified_count += csv_store.apply(modifier_func, filter_ids)
+                leader = _FileLock(csv_store.leader_file)
+                if not leader.acquire(blocking=False):
+                    # A running leader would overwrite a direct write with its own rows
+                    csv_store._append_deltas()
+                    return modified_count
+                try:
+                    if config.MULTI_PROCESS:
+                        csv_store._merge_deltas()
+                    if not csv_store.dirty:
+                        return modified_count
+                    with atomic_csv_update(config.CSV_FILE) as temp_file:
+                        csv_store.write_to(temp_file)
+                    csv_store.dirty.clear()
+                finally:
+                    leader.release()
+            return modified_count
         except (PermissionError, OSError) as e:
             if attempt < max_retries - 1:
                 wait_time = (attempt + 1) * 0.5
@@ -312,107 +558,324 @@ def modify_csv_rows(modifier_func: Callable[[dict], dict]) -> int:
             break
     return 0
 
-def update_csv_status(video_id: str, status: str):
-    """Update CSV status with proper file locking for multi-process safety"""
-    if not config.CSV_FILE.exists():
-        return
+class CsvStatusStore:
+    """
+    In-memory copy of the CSV, loaded once and owned by a single writer thread.
 
-    # Use a more unique temp file name to avoid conflicts between processes
-    import os
-    pid = os.getpid()
-    timestamp = int(time.time() * 1000000)  # microsecond precision
-    temp_file = config.CSV_FILE.parent / f'download_temp_{pid}_{timestamp}.csv'
-    
-    max_retries = 5
-    retry_delay = 0.1
-    
-    for attempt in range(max_retries):
+    Workers only queue (video_id, status) pairs with set(); the writer thread applies
+    them to the in-memory rows and rewrites the CSV at most every CSV_FLUSH_INTERVAL
+    seconds, so no worker ever waits on the file.
+
+    With MULTI_PROCESS, every process appends its changes to STATUS_DELTA_DIR/<pid>.log,
+    and only the process holding the lock on download.csv.leader rewrites the CSV: on
+    each flush it re-reads the CSV and merges every delta log into it, under the CSV file
+    lock. A follower takes over as leader as soon as the lock becomes free. Row state is
+    swapped under self.lock, since worker threads read it through set()/get_status().
+    """
+
+    _STOP = object()
+
+    def __init__(self, csv_file: Path):
+        self.csv_file = csv_file
+        self.header: List[str] = []
+        self.rows: List[List[str]] = []  # Plain lists, addressed by id_col/status_col
+        self.id_col = 0
+        self.status_col = 0
+        self.index: Dict[str, int] = {}
+        self.dirty: List[str] = []
+        self.pending: Dict[str, str] = {}  # Last status set() per video, so repeats can be dropped
+        self.loaded = False
+        self.queue: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._leader_lock: Optional[_FileLock] = None
+        self.leader_file = csv_file.with_name(csv_file.name + '.leader')
+        self.delta_file = config.STATUS_DELTA_DIR / f"{os.getpid()}.log"
+
+    def _read(self):
+        """Read the CSV and swap it in as the current rows"""
+        with self.csv_file.open('r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            if 'videoId' not in header:
+                raise ValueError(f"No videoId column in {self.csv_file}")
+            if 'status' not in header:
+                header.append('status')
+            width = len(header)
+            # Blank lines come back as empty lists; DictReader skipped them, so do the same
+            rows = [row + [''] * (width - len(row)) if len(row) < width else row for row in reader if row]
+        id_col = header.index('videoId')
+        index = {row[id_col]: i for i, row in enumerate(rows) if row[id_col]}
+        with self.lock:
+            self.header, self.rows, self.index = header, rows, index
+            self.id_col, self.status_col = id_col, header.index('status')
+
+    def _reload(self):
+        """Leader: start from the CSV as other processes left it, keeping this process's unwritten changes"""
+        unwritten = {vid: self.rows[self.index[vid]][self.status_col] for vid in self.dirty}
+        self._read()
+        self.dirty.clear()
+        for vid, status in unwritten.items():
+            self._apply(vid, status)
+
+    def load(self):
+        self._read()
+        self.dirty.clear()
+        self.pending.clear()
+        self.loaded = True
+        if not config.MULTI_PROCESS:
+            # Delta logs left by a MULTI_PROCESS run (e.g. a follower that finished after the
+            # leader's last merge) have no leader to merge them now; apply them as dirty rows
+            self._merge_deltas()
+        log.debug(f"Loaded {len(self.index)} videos from {self.csv_file}")
+
+    def apply(self, modifier_func: Callable[[str, str], str], filter_ids: Optional[Set[str]] = None) -> int:
+        """Run modifier_func(video_id, status) -> status over the rows; returns how many changed"""
+        if filter_ids is None:
+            targets = self.index.items()
+        else:
+            targets = ((vid, self.index[vid]) for vid in filter_ids if vid in self.index)
+        modified_count = 0
+        for vid, i in targets:
+            row = self.rows[i]
+            status = modifier_func(vid, row[self.status_col])
+            if status != row[self.status_col]:
+                row[self.status_col] = status
+                self.pending.pop(vid, None)
+                self.dirty.append(vid)
+                modified_count += 1
+        return modified_count
+
+    def write_to(self, path: Path):
+        with path.open('w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.header)
+            writer.writerows(self.rows)
+
+    def start(self):
+        if config.MULTI_PROCESS:
+            config.STATUS_DELTA_DIR.mkdir(parents=True, exist_ok=True)
+        self._writer = threading.Thread(target=self._writer_loop, name="csv-writer", daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        """Apply everything still queued, write the CSV a final time and stop the writer thread"""
+        if self._writer is None:
+            return
+        self.queue.put(self._STOP)
+        self._writer.join()
+        self._writer = None
+        if self._leader_lock is not None:
+            # Everything this process logged has been merged, so its delta log can go
+            try:
+                if self.delta_file.exists() and self.delta_file.stat().st_size == 0:
+                    self.delta_file.unlink()
+            except OSError:
+                pass
+            self._leader_lock.release()
+            self._leader_lock = None
+
+    def get_status(self, video_id: str) -> Optional[str]:
+        """Latest status requested for video_id, including ones still waiting in the queue"""
+        with self.lock:
+            return self._current_status(video_id)
+
+    def _current_status(self, video_id: str) -> Optional[str]:
+        status = self.pending.get(video_id)
+        if status is not None:
+            return status
+        i = self.index.get(video_id)
+        return None if i is None else self.rows[i][self.status_col]
+
+    def set(self, video_id: str, status: str):
+        with self.lock:
+            if self._current_status(video_id) == status:
+                return
+            self.pending[video_id] = status
+        self.queue.put((video_id, status))
+
+    def _apply(self, video_id: str, status: str):
+        i = self.index.get(video_id)
+        if i is None:
+            log.warning(f"Video ID {video_id} not found in CSV")
+            return
+        if self.rows[i][self.status_col] == status:
+            return
+        self.rows[i][self.status_col] = status
+        self.dirty.append(video_id)
+        log.debug(f"Updated status for {video_id}: {status}")
+
+    def _writer_loop(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                item = None
+
+            # Drain whatever else is already queued before deciding whether to write
+            stopping = False
+            while item is not None:
+                if item is self._STOP:
+                    stopping = True
+                else:
+                    self._apply(*item)
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if stopping or time.monotonic() - last_flush >= config.CSV_FLUSH_INTERVAL:
+                self._sync()
+                last_flush = time.monotonic()
+            if stopping:
+                return
+
+    def _sync(self):
+        """Flush directly, or via the delta logs and leader when several processes share the CSV"""
+        if config.MULTI_PROCESS:
+            self._append_deltas()
+            if self._leader_lock is None:
+                lock = _FileLock(self.leader_file)
+                if not lock.acquire(blocking=False):
+                    return
+                self._leader_lock = lock
+                log.info(f"Process {os.getpid()} is now the CSV leader")
+        with csv_file_lock():
+            if config.MULTI_PROCESS:
+                # Other processes may have written the CSV since the last flush (modify_csv_rows
+                # when no leader was running); start from the file and apply every delta log
+                self._reload()
+                self._merge_deltas()
+            self._flush()
+
+    def _append_deltas(self):
+        """Append this process's unwritten changes to its delta log as 'video_id,status' lines"""
+        if not self.dirty:
+            return
+        lines = ''.join(f"{vid},{self.rows[self.index[vid]][self.status_col]}\n" for vid in dict.fromkeys(self.dirty))
         try:
-            # Use file locking to prevent race conditions between processes
-            with config.CSV_FILE.open('r+', newline='', encoding='utf-8') as csvfile:
-                # Lock the file for exclusive access
-                fcntl.flock(csvfile.fileno(), fcntl.LOCK_EX)
-                
+            # modify_csv_rows can get here before start() has created the directory
+            self.delta_file.parent.mkdir(parents=True, exist_ok=True)
+            with self.delta_file.open('a', encoding='utf-8') as f:
+                _lock_file(f)
                 try:
-                    csvfile.seek(0)
-                    reader = csv.DictReader(csvfile)
-                    fieldnames = reader.fieldnames
-                    if fieldnames and 'status' not in fieldnames:
-                        fieldnames.append('status')
-
-                    rows = []
-                    found = False
-                    
-                    for row in reader:
-                        if row.get('videoId') == video_id:
-                            row['status'] = status
-                            found = True
-                        rows.append(row)
-                    
-                    if found:
-                        # Write to temporary file first
-                        with temp_file.open('w', newline='', encoding='utf-8') as tempfile:
-                            writer = csv.DictWriter(tempfile, fieldnames=fieldnames)
-                            writer.writeheader()
-                            writer.writerows(rows)
-                        
-                        # Atomically replace the original file
-                        temp_file.replace(config.CSV_FILE)
-                        log.debug(f"Updated status for {video_id}: {status}")
-                        break
-                    else:
-                        log.warning(f"Video ID {video_id} not found in CSV")
-                        break
-                        
+                    f.write(lines)
+                    f.flush()
                 finally:
-                    # Unlock the file
-                    fcntl.flock(csvfile.fileno(), fcntl.LOCK_UN)
-                    
+                    _unlock_file(f)
+            self.dirty.clear()
         except (IOError, OSError) as e:
-            if attempt < max_retries - 1:
-                log.warning(f"CSV update attempt {attempt + 1} failed for {video_id}, retrying in {retry_delay}s: {e}")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                log.error(f"Failed to update CSV status after {max_retries} attempts for {video_id}: {e}")
-        except Exception as e:
-            log.error(f"Unexpected error updating CSV status for {video_id}: {e}")
-            break
-        finally:
-            # Clean up temp file if it exists
-            if temp_file.exists():
+            log.error(f"Failed to append {len(self.dirty)} status update(s) to {self.delta_file}: {e}")
+
+    def _merge_deltas(self):
+        """Leader: apply and empty every process's delta log"""
+        if not config.STATUS_DELTA_DIR.is_dir():
+            return
+        for path in config.STATUS_DELTA_DIR.glob('*.log'):
+            try:
+                with path.open('r+', encoding='utf-8') as f:
+                    _lock_file(f)
+                    try:
+                        lines = f.read().splitlines()
+                        f.seek(0)
+                        f.truncate()
+                    finally:
+                        _unlock_file(f)
+            except (IOError, OSError) as e:
+                log.error(f"Failed to read status deltas from {path}: {e}")
+                continue
+            for line in lines:
+                video_id, _, status = line.partition(',')
+                if video_id and status:
+                    self._apply(video_id, status)
+
+    def _flush(self):
+        """Write all pending status changes to the CSV with one atomic rewrite; caller holds csv_file_lock"""
+        if not self.dirty:
+            return
+        try:
+            # Temp file and rename, so a crash, a full disk or a reader that takes no lock
+            # (04.error_download_error.py) never sees a half-written CSV
+            with atomic_csv_update(self.csv_file) as temp_file:
+                self.write_to(temp_file)
+            log.debug(f"Flushed {len(self.dirty)} status update(s) to {self.csv_file}")
+            self.dirty.clear()
+        except (IOError, OSError) as e:
+            # Pending changes stay in memory and go out with the next flush
+            log.error(f"Failed to flush {len(self.dirty)} CSV status update(s): {e}")
+
+csv_store = CsvStatusStore(config.CSV_FILE)
+
+class ArchiveStore:
+    """
+    In-memory set of archived video IDs, loaded once. Additions are appended to the
+    archive through one long-lived buffered handle, synced at batch boundaries;
+    removals only mark the set dirty, and flush() rewrites the file once.
+    """
+
+    def __init__(self, archive_file: Path):
+        self.archive_file = archive_file
+        self.ids: Set[str] = set()
+        self.dirty = False
+        self._handle = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            self.ids = set()
+            if self.archive_file.exists():
+                with self.archive_file.open('r', encoding='utf-8') as f:
+                    self.ids = {line.strip().split(' ', 1)[1] for line in f if line.strip().startswith('youtube ')}
+            self.dirty = False
+        log.debug(f"Loaded {len(self.ids)} archived videos from {self.archive_file}")
+
+    def add(self, video_id: str):
+        with self._lock:
+            if video_id in self.ids:
+                return
+            self.ids.add(video_id)
+            try:
+                if self._handle is None:
+                    self._handle = self.archive_file.open('a', encoding='utf-8', buffering=8192)
+                self._handle.write(f"youtube {video_id}\n")
+                log.debug(f"Added {video_id} to archive")
+            except Exception as e:
+                log.error(f"Error adding {video_id} to archive: {e}")
+
+    def discard(self, video_id: str):
+        with self._lock:
+            if video_id in self.ids:
+                self.ids.discard(video_id)
+                self.dirty = True
+                log.debug(f"Removed {video_id} from archive")
+
+    def sync(self):
+        """Push buffered additions to disk (called at the end of each batch)"""
+        with self._lock:
+            if self._handle is not None:
                 try:
-                    temp_file.unlink()
-                except:
-                    pass
+                    self._handle.flush()
+                except Exception as e:
+                    log.error(f"Error flushing archive: {e}")
 
-def add_to_archive(video_id: str):
-    """Add video ID to download archive after successful verification"""
-    try:
-        with config.ARCHIVE_FILE.open('a', encoding='utf-8') as f:
-            f.write(f"youtube {video_id}\n")
-        log.debug(f"Added {video_id} to archive")
-    except Exception as e:
-        log.error(f"Error adding {video_id} to archive: {e}")
+    def flush(self):
+        """Rewrite the archive from the set if any video was removed since the last flush"""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            if not self.dirty:
+                return
+            try:
+                with self.archive_file.open('w', encoding='utf-8') as f:
+                    f.writelines(f"youtube {vid}\n" for vid in sorted(self.ids))
+                self.dirty = False
+            except Exception as e:
+                log.error(f"Error rewriting archive: {e}")
 
-def remove_from_archive(video_id: str):
-    """Remove video ID from download archive if download failed"""
-    if not config.ARCHIVE_FILE.exists():
-        return
-    
-    try:
-        with config.ARCHIVE_FILE.open('r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # Filter out the failed video
-        updated_lines = [line for line in lines if not line.strip().endswith(video_id)]
-        
-        if len(updated_lines) < len(lines):
-            with config.ARCHIVE_FILE.open('w', encoding='utf-8') as f:
-                f.writelines(updated_lines)
-            log.debug(f"Removed {video_id} from archive")
-    except Exception as e:
-        log.error(f"Error removing {video_id} from archive: {e}")
+archive_store = ArchiveStore(config.ARCHIVE_FILE)
+atexit.register(archive_store.flush)
 
 def generate_archive_from_csv():
     """Generate archive file from CSV done entries - used for initial setup only"""
@@ -424,17 +887,19 @@ def generate_archive_from_csv():
         log.debug("Archive file already exists, skipping regeneration")
         return
 
+    downloaded_ids = get_done_ids_set()
     done_ids = []
     try:
-        with config.CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row.get('status') == VideoStatus.DONE and row.get('videoId'):
-                    # Only add to archive if file actually exists
-                    if verify_downloaded_file(row['videoId']):
-                        done_ids.append(f"youtube {row['videoId']}")
-                    else:
-                        log.warning(f"CSV marked as done but file missing, not adding to archive: {row['videoId']}")
+        if not csv_store.loaded:
+            csv_store.load()
+        id_col, status_col = csv_store.id_col, csv_store.status_col
+        for row in csv_store.rows:
+            if row[status_col] == VideoStatus.DONE and row[id_col]:
+                # Only add to archive if file actually exists
+                if row[id_col] in downloaded_ids:
+                    done_ids.append(f"youtube {row[id_col]}")
+                else:
+                    log.warning(f"CSV marked as done but file missing, not adding to archive: {row[id_col]}")
     except Exception as e:
         log.error(f"Error reading CSV for archive: {e}")
         return
@@ -476,20 +941,14 @@ def rebuild_archive_from_files(additional_dirs: List[str] = None, preserve_exist
             with config.ARCHIVE_FILE.open('r', encoding='utf-8') as f:
                 existing_entries = {line.strip() for line in f if line.strip()}
         
-        # Find all video files in all directories
-        video_extensions = ['.mp4', '.webm', '.mkv', '.m4a', '.mp3']
-        downloaded_files = set(existing_entries)  # Start with existing entries
-        
+        # Find all video files in all directories, one os.scandir pass per directory
         for search_dir in search_dirs:
             log.info(f"Searching for video files in: {search_dir}")
-            for ext in video_extensions:
-                for file_path in search_dir.glob(f"*{ext}"):
-                    if file_path.is_file() and file_path.stat().st_size > 1024:
-                        video_id = file_path.stem
-                        downloaded_files.add(f"youtube {video_id}")
+        downloaded_ids = get_done_ids_set(search_dirs[1:])
+        downloaded_files = existing_entries | {f"youtube {video_id}" for video_id in downloaded_ids}
         
         # Sort for consistent output
-        downloaded_files = sorted(list(downloaded_files))
+        downloaded_files = sorted(downloaded_files)
         
         # Write to archive file
         with config.ARCHIVE_FILE.open('w', encoding='utf-8') as f:
@@ -502,12 +961,10 @@ def rebuild_archive_from_files(additional_dirs: List[str] = None, preserve_exist
         # Update CSV status for these files
         video_ids_set = {entry.split(' ', 1)[1] for entry in downloaded_files if ' ' in entry}
         
-        def update_downloaded_status(row: dict) -> dict:
-            if row.get('videoId') in video_ids_set and row.get('status') != VideoStatus.DONE:
-                row['status'] = VideoStatus.DONE
-            return row
+        def update_downloaded_status(video_id: str, status: str) -> str:
+            return VideoStatus.DONE if video_id in video_ids_set else status
         
-        updated = modify_csv_rows(update_downloaded_status)
+        updated = modify_csv_rows(update_downloaded_status, filter_ids=video_ids_set)
         if updated > 0:
             log.info(f"Updated {updated} CSV entries to '{VideoStatus.DONE}' status")
             
@@ -521,13 +978,10 @@ def update_csv_from_archive():
         with config.ARCHIVE_FILE.open('r', encoding='utf-8') as f:
             archived_ids = {line.strip().split(' ', 1)[1] for line in f if line.strip().startswith('youtube ')}
         
-        def modifier(row: dict) -> dict:
-            vid = row.get('videoId')
-            if vid in archived_ids and row.get('status') != VideoStatus.DONE:
-                row['status'] = VideoStatus.DONE
-            return row
+        def modifier(video_id: str, status: str) -> str:
+            return VideoStatus.DONE if video_id in archived_ids else status
         
-        updated = modify_csv_rows(modifier)
+        updated = modify_csv_rows(modifier, filter_ids=archived_ids)
         if updated > 0:
             log.info(f"Updated {updated} videos to '{VideoStatus.DONE}' from archive")
     except Exception as e:
@@ -544,9 +998,64 @@ def categorize_download_error(error_message: str) -> VideoStatus:
     else:
         return VideoStatus.FAILED
 
-def download_batch(urls: List[str], disable_proxy: bool = False) -> Tuple[int, int, List[str]]:
+def _download_one(url: str, video_id: str, ydl_factory: Callable[..., yt_dlp.YoutubeDL]) -> VideoStatus:
+    """Download and verify one video, record its status, and return it"""
+    try:
+        ydl_factory().download([url])
+        
+        # Verify the download actually succeeded
+        if verify_downloaded_file(video_id, check_disk=True):
+            csv_store.set(video_id, VideoStatus.DONE)
+            archive_store.add(video_id)  # Only add to archive after verification
+            log.info(f"Successfully downloaded and verified: {video_id}")
+            return VideoStatus.DONE
+        log.warning(f"Download reported success but file not found: {video_id}")
+        csv_store.set(video_id, VideoStatus.FAILED)
+        archive_store.discard(video_id)
+        return VideoStatus.FAILED
+                
+    except yt_dlp.utils.DownloadError as e:
+        error_message = str(e)
+        
+        if "captcha" in error_message.lower() or "challenge" in error_message.lower():
+            log.warning(f"Captcha challenge detected for {video_id}: {error_message}")
+            status = VideoStatus.CAPTCHA_CHALLENGE
+        elif "ssl" in error_message.lower() or "eof" in error_message.lower() or "connection" in error_message.lower():
+            log.warning(f"SSL/Connection error for {video_id} (VPN related): {error_message}")
+            log.info(f"Retrying {video_id} in 10 seconds due to VPN connection issue...")
+            time.sleep(10)  # Wait longer for VPN to stabilize
+            
+            # Retry once with fresh connection
+            try:
+                ydl_factory(retry=True).download([url])
+                if verify_downloaded_file(video_id, check_disk=True):
+                    csv_store.set(video_id, VideoStatus.DONE)
+                    archive_store.add(video_id)
+                    log.info(f"Successfully downloaded on retry: {video_id}")
+                    return VideoStatus.DONE
+                log.warning(f"Retry failed for {video_id}, will try again later")
+            except Exception as retry_e:
+                log.warning(f"Retry also failed for {video_id}: {str(retry_e)}")
+            status = VideoStatus.SSL_RETRY  # Mark for later retry instead of failed
+        elif "unavailable" in error_message.lower():
+            log.warning(f"Video {video_id} is unavailable: {error_message}")
+            status = VideoStatus.UNAVAILABLE
+        else:
+            log.error(f"Error downloading {video_id}: {error_message}")
+            status = VideoStatus.FAILED
+    except Exception as e:
+        log.error(f"Unexpected error downloading {video_id}: {str(e)}")
+        status = VideoStatus.FAILED
+
+    csv_store.set(video_id, status)
+    archive_store.discard(video_id)
+    return status
+
+def download_batch(urls: List[str], disable_proxy: bool = False, not_before: float = 0.0) -> Tuple[int, int, List[str]]:
     """
-    Download a batch of YouTube videos with proper verification.
+    Download a batch of YouTube videos with proper verification. Each download holds one of the
+    MAX_WORKERS download slots shared by every batch, so MAX_WORKERS caps the whole run.
+    The batch waits until the not_before timestamp so its pause overlaps with running batches.
     
     Returns:
         Tuple of (success_count, fail_count, captcha_challenged_urls)
@@ -554,86 +1063,67 @@ def download_batch(urls: List[str], disable_proxy: bool = False) -> Tuple[int, i
     if not urls:
         return 0, 0, []
 
+    delay = not_before - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
     ydl_opts = build_yt_dlp_opts(disable_proxy)
     captcha_challenged_urls = []
     success = 0
     
     log.info(f"Batch processing: {len(urls)} videos")
 
-    for idx, url in enumerate(urls):
-        video_id = extract_video_id(url)
-        update_csv_status(video_id, VideoStatus.IN_PROGRESS)
-        
-        # Check if file already exists and is verified
-        if verify_downloaded_file(video_id):
-            log.info(f"Video {video_id} already downloaded and verified, skipping")
-            update_csv_status(video_id, VideoStatus.DONE)
-            success += 1
-            continue
-            
-        try:
-            # Human-like delay between downloads
-            if idx > 0:
-                human_sleep(base_time=5.0, variation=3.0, min_time=2.0)
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+    # YoutubeDL is not thread-safe, so each download thread gets its own instance for the
+    # whole batch (keeping its HTTP connections alive across URLs); the fresh-connection
+    # instance for SSL retries is only created if a retry is needed
+    local = threading.local()
+    ydl_lock = threading.Lock()
+
+    with ExitStack() as ydl_stack:
+        def ydl_factory(retry: bool = False) -> yt_dlp.YoutubeDL:
+            attr = "retry_ydl" if retry else "ydl"
+            ydl = getattr(local, attr, None)
+            if ydl is None:
+                ydl = yt_dlp.YoutubeDL(build_yt_dlp_opts(disable_proxy) if retry else ydl_opts)
+                with ydl_lock:
+                    ydl_stack.enter_context(ydl)
+                setattr(local, attr, ydl)
+            return ydl
+
+        def download_in_slot(url: str, video_id: str) -> VideoStatus:
+            with concurrency.download_slot():
+                return _download_one(url, video_id, ydl_factory)
+
+        # One thread per URL at most; how many of them actually download is up to the slots
+        with ThreadPoolExecutor(max_workers=min(len(urls), config.MAX_WORKERS_LIMIT)) as executor:
+            futures = {}
+            for url in urls:
+                video_id = extract_video_id(url)
                 
-                # Verify the download actually succeeded
+                # Check if file already exists and is verified; no IN_PROGRESS round trip for skips
                 if verify_downloaded_file(video_id):
+                    log.info(f"Video {video_id} already downloaded and verified, skipping")
+                    csv_store.set(video_id, VideoStatus.DONE)
                     success += 1
-                    update_csv_status(video_id, VideoStatus.DONE)
-                    add_to_archive(video_id)  # Only add to archive after verification
-                    log.info(f"Successfully downloaded and verified: {video_id}")
-                else:
-                    log.warning(f"Download reported success but file not found: {video_id}")
-                    update_csv_status(video_id, VideoStatus.FAILED)
-                    remove_from_archive(video_id)
-                    
-        except yt_dlp.utils.DownloadError as e:
-            error_message = str(e)
-            
-            if "captcha" in error_message.lower() or "challenge" in error_message.lower():
-                log.warning(f"Captcha challenge detected for {video_id}: {error_message}")
-                captcha_challenged_urls.append(url)
-                update_csv_status(video_id, VideoStatus.CAPTCHA_CHALLENGE)
-                remove_from_archive(video_id)
-            elif "ssl" in error_message.lower() or "eof" in error_message.lower() or "connection" in error_message.lower():
-                log.warning(f"SSL/Connection error for {video_id} (VPN related): {error_message}")
-                log.info(f"Retrying {video_id} in 10 seconds due to VPN connection issue...")
-                time.sleep(10)  # Wait longer for VPN to stabilize
-                
-                # Retry once with fresh connection
-                try:
-                    with yt_dlp.YoutubeDL(build_yt_dlp_opts(disable_proxy)) as retry_ydl:
-                        retry_ydl.download([url])
-                        if verify_downloaded_file(video_id):
-                            success += 1
-                            update_csv_status(video_id, VideoStatus.DONE)
-                            add_to_archive(video_id)
-                            log.info(f"Successfully downloaded on retry: {video_id}")
-                        else:
-                            log.warning(f"Retry failed for {video_id}, will try again later")
-                            update_csv_status(video_id, VideoStatus.SSL_RETRY)  # Special status for SSL issues
-                            remove_from_archive(video_id)
-                except Exception as retry_e:
-                    log.warning(f"Retry also failed for {video_id}: {str(retry_e)}")
-                    update_csv_status(video_id, VideoStatus.SSL_RETRY)  # Mark for later retry instead of failed
-                    remove_from_archive(video_id)
-            elif "unavailable" in error_message.lower():
-                log.warning(f"Video {video_id} is unavailable: {error_message}")
-                update_csv_status(video_id, VideoStatus.UNAVAILABLE)
-                remove_from_archive(video_id)
-            else:
-                log.error(f"Error downloading {video_id}: {error_message}")
-                update_csv_status(video_id, VideoStatus.FAILED)
-                remove_from_archive(video_id)
-        except Exception as e:
-            log.error(f"Unexpected error downloading {video_id}: {str(e)}")
-            update_csv_status(video_id, VideoStatus.FAILED)
-            remove_from_archive(video_id)
+                    continue
+
+                csv_store.set(video_id, VideoStatus.IN_PROGRESS)
+
+                # Human-like delay between download starts
+                if futures:
+                    human_sleep(base_time=5.0, variation=3.0, min_time=2.0)
+                futures[executor.submit(download_in_slot, url, video_id)] = url
+
+            for future in as_completed(futures):
+                status = future.result()
+                if status == VideoStatus.DONE:
+                    success += 1
+                elif status == VideoStatus.CAPTCHA_CHALLENGE:
+                    captcha_challenged_urls.append(futures[future])
     
+    archive_store.sync()
     fail = len(urls) - success
+    concurrency.record(success, fail)
     if fail > 0:
         log.warning(f"Batch finished with {fail} failure(s), {len(captcha_challenged_urls)} captcha challenges")
     else:
@@ -646,16 +1136,18 @@ def load_videos_from_csv(channel_id: Optional[str] = None) -> List[str]:
         log.error(f"CSV file not found: {config.CSV_FILE}")
         sys.exit(1)
     try:
-        with config.CSV_FILE.open(newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = [row for row in reader if row.get('videoId')]  # FIXED: Use videoId instead of video_url
-            if channel_id:
-                rows = [row for row in rows if row.get('channelId') == channel_id]
-            video_ids = [row['videoId'] for row in rows if row.get('status') not in [VideoStatus.DONE, VideoStatus.UNAVAILABLE]]
-            urls = [f"https://www.youtube.com/watch?v={vid}" for vid in video_ids]  # FIXED: Construct URLs
-            random.shuffle(urls)
-            log.info(f"Found {len(urls)} videos to download" + (f" for channel {channel_id}" if channel_id else ""))
-            return urls
+        if not csv_store.loaded:
+            csv_store.load()
+        id_col, status_col = csv_store.id_col, csv_store.status_col
+        channel_col = csv_store.header.index('channelId') if 'channelId' in csv_store.header else None
+        skip = (VideoStatus.DONE, VideoStatus.UNAVAILABLE)
+        video_ids = [row[id_col] for row in csv_store.rows
+                     if row[id_col] and row[status_col] not in skip  # FIXED: Use videoId instead of video_url
+                     and (not channel_id or (channel_col is not None and row[channel_col] == channel_id))]
+        urls = [f"https://www.youtube.com/watch?v={vid}" for vid in video_ids]  # FIXED: Construct URLs
+        random.shuffle(urls)
+        log.info(f"Found {len(urls)} videos to download" + (f" for channel {channel_id}" if channel_id else ""))
+        return urls
     except Exception as e:
         log.error(f"CSV read error: {e}")
         sys.exit(1)
@@ -669,34 +1161,44 @@ def main(channel_id: Optional[str] = None, disable_proxy: bool = False):
     if not urls:
         log.info("No new videos to download" + (f" for channel {channel_id}" if channel_id else ""))
         return
+    archive_store.load()
+    csv_store.start()
 
     start_time = time.time()
     total_success = total_fail = 0
 
-    with ThreadPoolExecutor(max_workers=config.MAX_WORKERS) as executor:
-        futures = []
-        batch_num = 1
-        i = 0
-        while i < len(urls):
-            batch_size = random.randint(config.MIN_BATCH_SIZE, config.MAX_BATCH_SIZE)
-            batch_urls = urls[i:i + batch_size]
-            if not batch_urls:
-                break
-            log.info(f"--- Submitting batch {batch_num} ({len(batch_urls)} videos) ---")
-            futures.append(executor.submit(download_batch, batch_urls, disable_proxy))
-            i += len(batch_urls)
-            batch_num += 1
-            
-            # Human-like pause between batch submissions
-            if i < len(urls):
-                batch_pause()
-        
-        for future in as_completed(futures):
-            success, fail, captcha_challenged_urls = future.result()
-            total_success += success
-            total_fail += fail
-            log.info(f"Batch completed: {success} downloaded, {fail} failed.")
+    try:
+        # Sized for the controller's ceiling; concurrency.download_slot() keeps the number of
+        # downloads running across all batches at the current, adaptively tuned MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=config.MAX_WORKERS_LIMIT) as executor:
+            inflight = set()
+            batch_num = 1
+            i = 0
+            next_start = 0.0
+            while i < len(urls) or inflight:
+                # Keep a bounded window of batches queued or running (sized from the current,
+                # adaptively tuned worker count)
+                while i < len(urls) and len(inflight) < 2 * config.MAX_WORKERS:
+                    batch_size = random.randint(config.MIN_BATCH_SIZE, config.MAX_BATCH_SIZE)
+                    batch_urls = urls[i:i + batch_size]
+                    log.info(f"--- Submitting batch {batch_num} ({len(batch_urls)} videos) ---")
+                    inflight.add(executor.submit(download_batch, batch_urls, disable_proxy, next_start))
+                    # Human-like pause before the following batch starts; the batch sleeps it off
+                    # in its worker, so the submitter and running batches are never held up
+                    next_start = max(next_start, time.time()) + batch_pause()
+                    i += len(batch_urls)
+                    batch_num += 1
+
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    success, fail, captcha_challenged_urls = future.result()
+                    total_success += success
+                    total_fail += fail
+                    log.info(f"Batch completed: {success} downloaded, {fail} failed.")
+    finally:
+        csv_store.stop()  # Final CSV write, even if a batch raised
 
+    archive_store.flush()
     update_csv_from_archive()
     runtime = (time.time() - start_time) / 60
     log.info(f"=== Download Complete: {total_success} success, {total_fail} failed in {runtime:.1f} minutes ===")
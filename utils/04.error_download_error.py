@@ -11,21 +11,144 @@ Analyzes download errors from our conversations and provides cleanup functions:
 """
 import csv
 import logging
+import os
 import shutil
+import sqlite3
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl  # Optional: copy-on-write backups via the FICLONE ioctl (Linux btrfs/xfs)
+    FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+except ImportError:
+    fcntl = None
 
 # Setup paths
 DOWNLOADS_DIR = Path.home() / "Downloads" / "YouTube"
 CSV_FILE = Path("output/download.csv")
 ARCHIVE_FILE = Path("output/download_archive.txt")
 BACKUP_DIR = Path("output/backups")
+INDEX_FILE = Path("output/download_index.sqlite")
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.m4a')
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 log = logging.getLogger(__name__)
 
+def iter_download_csv(f) -> Tuple[List[str], Iterator[List[str]]]:
+    """
+    Parse an open download CSV with csv.reader; returns (header, rows).
+
+    Rows are plain lists padded to the header width, and the videoId/status columns are
+    added to the header if missing, so csv_columns() always resolves. Blank lines are
+    skipped, as DictReader did.
+    """
+    reader = csv.reader(f)
+    header = next(reader, [])
+    for column in ('videoId', 'status'):
+        if column not in header:
+            header.append(column)
+    width = len(header)
+    rows = (row + [''] * (width - len(row)) if len(row) < width else row for row in reader if row)
+    return header, rows
+
+def csv_columns(header: List[str]) -> Tuple[int, int]:
+    """Indices of the (videoId, status) columns"""
+    return header.index('videoId'), header.index('status')
+
+def csv_stamp() -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of the download CSV, to tell whether it changed since it was read"""
+    try:
+        st = os.stat(CSV_FILE)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def read_download_csv() -> Tuple[List[str], List[List[str]]]:
+    """Read the download CSV once; returns (header, rows)"""
+    with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
+        header, rows = iter_download_csv(f)
+        return header, list(rows)
+
+def write_download_csv(header: List[str], rows: Iterable[List[str]]) -> None:
+    """Stream rows into a temp file next to the CSV, then swap it in with os.replace"""
+    with tempfile.NamedTemporaryFile('w', newline='', encoding='utf-8', dir=CSV_FILE.parent,
+                                     suffix='.tmp', delete=False) as f:
+        try:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    if CSV_FILE.exists():
+        shutil.copymode(CSV_FILE, f.name)  # NamedTemporaryFile is created 0600
+    os.replace(f.name, CSV_FILE)
+
+def backup_file(src: Path, dst: Path) -> None:
+    """
+    Copy src to dst as a copy-on-write reflink when the filesystem supports it, otherwise
+    with a full shutil.copy2. Not a hardlink: the downloader rewrites the CSV and appends
+    to the archive in place, which would change a hardlinked backup too.
+    """
+    if fcntl is not None:
+        try:
+            with src.open('rb') as fsrc, dst.open('wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass  # Not Linux, or no reflink support on this filesystem
+    shutil.copy2(src, dst)
+
+def read_archive_ids() -> Set[str]:
+    """Video IDs listed in the archive, read in one go"""
+    if not ARCHIVE_FILE.exists():
+        return set()
+    lines = ARCHIVE_FILE.read_text(encoding='utf-8').splitlines()
+    return {line[8:] for line in map(str.strip, lines) if line.startswith('youtube ')}
+
+def write_archive_ids(video_ids: Set[str]) -> None:
+    """Rewrite the archive with one sorted entry per video, in a single write"""
+    with ARCHIVE_FILE.open('w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write(''.join(f"youtube {video_id}\n" for video_id in sorted(video_ids)))
+
+def is_corrupted_id(video_id: str) -> bool:
+    """
+    A well-formed video ID is 11 characters with no spaces or commas; anything else is an
+    entry corrupted by a race condition (the old '_VweaEx1j62do_vQ' suffix check can never
+    match an 11-character ID, so the length test already covers it).
+    """
+    # The two substring scans only run on 11-character IDs, and on strings this short they
+    # beat both a regex fullmatch and a str.translate round trip
+    return len(video_id) != 11 or ' ' in video_id or ',' in video_id
+
+def snapshot_downloads() -> Dict[str, int]:
+    """Map video_id -> file size for every video file in DOWNLOADS_DIR, from one os.scandir pass"""
+    sizes: Dict[str, int] = {}
+    try:
+        with os.scandir(DOWNLOADS_DIR) as entries:
+            for entry in entries:
+                video_id, ext = os.path.splitext(entry.name)
+                if ext in VIDEO_EXTENSIONS and entry.is_file():
+                    # Keep the largest file when a video exists in several formats
+                    sizes[video_id] = max(sizes.get(video_id, 0), entry.stat().st_size)
+    except FileNotFoundError:
+        pass
+    return sizes
+
+def verified_video_ids(downloads: Dict[str, int]) -> Set[str]:
+    """Video IDs whose file is big enough to be a real download (more than 1KB)"""
+    return {video_id for video_id, size in downloads.items() if size > 1024}
+
+def downloaded_video_ids(downloads: Dict[str, int]) -> Set[str]:
+    """Video IDs with a file on disk, as used to rebuild the archive"""
+    return {video_id for video_id in downloads if len(video_id) >= 10}
+
 class ErrorAnalyzer:
     """Analyze and fix the most important download errors from our sessions"""
     
@@ -37,10 +160,84 @@ class ErrorAnalyzer:
             'archive_mismatches': 0,
             'failed_downloads': 0
         }
+        self._header: Optional[List[str]] = None
+        self._rows: Optional[List[List[str]]] = None
+        self._csv_stamp: Optional[Tuple[int, int]] = None  # CSV (mtime_ns, size) taken before _rows was read
+        self._downloads: Optional[Dict[str, int]] = None
+        self._archive_ids: Optional[Set[str]] = None
+        self._row_scan: Optional[Tuple[Dict[str, int], List[str]]] = None
+    
+    @property
+    def rows(self) -> List[List[str]]:
+        """CSV rows, read on first use and shared by every check"""
+        if self._rows is None:
+            self._csv_stamp = csv_stamp()
+            self._header, self._rows = read_download_csv()
+        return self._rows
+    
+    @property
+    def columns(self) -> Tuple[int, int]:
+        """(videoId, status) column indices of the rows"""
+        if self._header is None:
+            self._csv_stamp = csv_stamp()
+            self._header, self._rows = read_download_csv()
+        return csv_columns(self._header)
+    
+    @property
+    def downloads(self) -> Dict[str, int]:
+        """Snapshot of DOWNLOADS_DIR, taken on first use"""
+        if self._downloads is None:
+            self._downloads = snapshot_downloads()
+        return self._downloads
+    
+    @property
+    def archive_ids(self) -> Set[str]:
+        """Video IDs in the archive, read on first use"""
+        if self._archive_ids is None:
+            self._archive_ids = read_archive_ids()
+        return self._archive_ids
+    
+    @property
+    def row_scan(self) -> Tuple[Dict[str, int], List[str]]:
+        """Per-status counts and done video IDs, gathered in one pass shared by the row checks"""
+        if self._row_scan is None:
+            counts = {'ssl_retry': 0, 'corrupted': 0, 'failed': 0}
+            done_ids = []
+            vid_i, st_i = self.columns
+            for row in self.rows:
+                video_id = row[vid_i].strip()
+                if is_corrupted_id(video_id):
+                    counts['corrupted'] += 1
+                status = row[st_i].strip()
+                if status == 'done':
+                    done_ids.append(video_id)
+                elif status == 'ssl_retry':
+                    counts['ssl_retry'] += 1
+                elif status in ('failed', 'unavailable'):
+                    counts['failed'] += 1
+            self._row_scan = counts, done_ids
+        return self._row_scan
+    
+    def _prefetch(self) -> None:
+        """Read the CSV, the archive and the downloads directory concurrently"""
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            stamp = csv_stamp()
+            csv_future = executor.submit(read_download_csv)
+            archive_future = executor.submit(read_archive_ids)
+            downloads_future = executor.submit(snapshot_downloads)
+        # A source that failed to load is left unset; the check using it retries and logs the error
+        if csv_future.exception() is None:
+            self._csv_stamp = stamp
+            self._header, self._rows = csv_future.result()
+        if archive_future.exception() is None:
+            self._archive_ids = archive_future.result()
+        if downloads_future.exception() is None:
+            self._downloads = downloads_future.result()
     
     def analyze_all_errors(self) -> Dict[str, int]:
         """Run comprehensive error analysis"""
         log.info("🔍 Starting comprehensive error analysis...")
+        self._prefetch()
         
         # 1. Check for SSL retry entries (from VPN issues)
         self.error_stats['ssl_errors'] = self._check_ssl_errors()
@@ -63,12 +260,7 @@ class ErrorAnalyzer:
         """Check for SSL/VPN related errors"""
         ssl_count = 0
         try:
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    status = row.get('status', '').strip()
-                    if status == 'ssl_retry':
-                        ssl_count += 1
+            ssl_count = self.row_scan[0]['ssl_retry']
             log.info(f"Found {ssl_count} videos with SSL/VPN errors")
         except Exception as e:
             log.error(f"Error checking SSL errors: {e}")
@@ -78,17 +270,8 @@ class ErrorAnalyzer:
         """Check for corrupted CSV entries (invalid video IDs)"""
         corrupted_count = 0
         try:
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    video_id = row.get('videoId', '').strip()
-                    # Invalid video ID patterns from race conditions
-                    if (not video_id or 
-                        len(video_id) != 11 or 
-                        ' ' in video_id or 
-                        ',' in video_id or
-                        video_id.endswith('_VweaEx1j62do_vQ')):
-                        corrupted_count += 1
+            # Invalid video ID patterns from race conditions
+            corrupted_count = self.row_scan[0]['corrupted']
             log.info(f"Found {corrupted_count} corrupted CSV entries")
         except Exception as e:
             log.error(f"Error checking corrupted entries: {e}")
@@ -98,13 +281,8 @@ class ErrorAnalyzer:
         """Check for videos marked done but files missing"""
         missing_count = 0
         try:
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row.get('status', '').strip() == 'done':
-                        video_id = row.get('videoId', '').strip()
-                        if not self._file_exists(video_id):
-                            missing_count += 1
+            verified = verified_video_ids(self.downloads)
+            missing_count = sum(1 for video_id in self.row_scan[1] if video_id not in verified)
             log.info(f"Found {missing_count} missing files (marked done but no file)")
         except Exception as e:
             log.error(f"Error checking missing files: {e}")
@@ -115,22 +293,13 @@ class ErrorAnalyzer:
         mismatch_count = 0
         try:
             # Get CSV done videos
-            csv_done = set()
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row.get('status', '').strip() == 'done':
-                        csv_done.add(row.get('videoId', '').strip())
+            csv_done = set(self.row_scan[1])
             
             # Get archive videos
-            archive_videos = set()
-            if ARCHIVE_FILE.exists():
-                with ARCHIVE_FILE.open('r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.strip().startswith('youtube '):
-                            archive_videos.add(line.strip().split(' ', 1)[1])
+            archive_videos = self.archive_ids
             
-            mismatch_count = len(csv_done.symmetric_difference(archive_videos))
+            # Size of the symmetric difference, without building it
+            mismatch_count = len(csv_done) + len(archive_videos) - 2 * len(csv_done & archive_videos)
             log.info(f"Found {mismatch_count} CSV/Archive mismatches")
         except Exception as e:
             log.error(f"Error checking archive inconsistencies: {e}")
@@ -140,32 +309,41 @@ class ErrorAnalyzer:
         """Check for permanently failed downloads"""
         failed_count = 0
         try:
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    status = row.get('status', '').strip()
-                    if status in ['failed', 'unavailable']:
-                        failed_count += 1
+            failed_count = self.row_scan[0]['failed']
             log.info(f"Found {failed_count} permanently failed downloads")
         except Exception as e:
             log.error(f"Error checking failed downloads: {e}")
         return failed_count
-    
-    def _file_exists(self, video_id: str) -> bool:
-        """Check if video file exists"""
-        extensions = ['.mp4', '.webm', '.mkv', '.m4a']
-        for ext in extensions:
-            file_path = DOWNLOADS_DIR / f"{video_id}{ext}"
-            if file_path.exists() and file_path.stat().st_size > 1024:
-                return True
-        return False
 
 class ErrorCleaner:
     """Clean up problematic files and entries"""
     
-    def __init__(self):
+    def __init__(self, header: Optional[List[str]] = None, rows: Optional[List[List[str]]] = None,
+                 downloads: Optional[Dict[str, int]] = None, archive_ids: Optional[Set[str]] = None,
+                 rows_stamp: Optional[Tuple[int, int]] = None):
         self.backup_dir = BACKUP_DIR
         self.backup_dir.mkdir(exist_ok=True)
+        # Rows already read by the analyzer are fixed and written back in one pass, as long as
+        # the CSV still has the stamp it had when they were read; otherwise (the downloader
+        # may have flushed since) the CSV is streamed from disk instead
+        self._header = header
+        self._rows = rows
+        self._rows_stamp = rows_stamp
+        self._downloads = downloads
+        self._archive_ids = archive_ids
+    
+    @classmethod
+    def from_analyzer(cls, analyzer: 'ErrorAnalyzer') -> 'ErrorCleaner':
+        """Cleaner reusing whatever the analyzer already read (CSV rows, file snapshot, archive)"""
+        return cls(analyzer._header, analyzer._rows, analyzer._downloads, analyzer._archive_ids,
+                   analyzer._csv_stamp)
+    
+    @property
+    def downloads(self) -> Dict[str, int]:
+        """Snapshot of DOWNLOADS_DIR, reused from the analyzer when it took one"""
+        if self._downloads is None:
+            self._downloads = snapshot_downloads()
+        return self._downloads
     
     def cleanup_all_errors(self, analyzer_stats: Dict[str, int]) -> None:
         """Clean up all identified error types"""
@@ -174,17 +352,13 @@ class ErrorCleaner:
         # Create backup first
         self._create_backup()
         
-        # 1. Reset SSL errors for retry
-        if analyzer_stats['ssl_errors'] > 0:
-            self._reset_ssl_errors()
-        
-        # 2. Remove corrupted entries
-        if analyzer_stats['corrupted_entries'] > 0:
-            self._remove_corrupted_entries()
-        
-        # 3. Fix missing files (reset status)
-        if analyzer_stats['missing_files'] > 0:
-            self._fix_missing_files()
+        # 1-3. Reset SSL errors for retry, remove corrupted entries and reset the status of
+        # missing files, all in one rewrite of the CSV
+        reset_ssl = analyzer_stats['ssl_errors'] > 0
+        remove_corrupted = analyzer_stats['corrupted_entries'] > 0
+        fix_missing = analyzer_stats['missing_files'] > 0
+        if reset_ssl or remove_corrupted or fix_missing:
+            self._clean_csv(reset_ssl, remove_corrupted, fix_missing)
         
         # 4. Synchronize archive
         if analyzer_stats['archive_mismatches'] > 0:
@@ -200,119 +374,68 @@ class ErrorCleaner:
         timestamp = int(time.time())
         if CSV_FILE.exists():
             backup_csv = self.backup_dir / f"download_error_cleanup_{timestamp}.csv"
-            shutil.copy2(CSV_FILE, backup_csv)
+            backup_file(CSV_FILE, backup_csv)
             log.info(f"Backed up CSV to {backup_csv}")
         
         if ARCHIVE_FILE.exists():
             backup_archive = self.backup_dir / f"archive_error_cleanup_{timestamp}.txt"
-            shutil.copy2(ARCHIVE_FILE, backup_archive)
+            backup_file(ARCHIVE_FILE, backup_archive)
             log.info(f"Backed up archive to {backup_archive}")
     
-    def _reset_ssl_errors(self) -> None:
-        """Reset SSL retry entries to pending for retry"""
-        updated_rows = []
-        reset_count = 0
+    def _clean_csv(self, reset_ssl: bool, remove_corrupted: bool, fix_missing: bool) -> None:
+        """Apply the requested CSV fixes in a single streaming rewrite"""
+        counts = {'ssl': 0, 'corrupted': 0, 'missing': 0}
+        verified = verified_video_ids(self.downloads) if fix_missing else set()
         
-        try:
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                fieldnames = reader.fieldnames
-                
-                for row in reader:
-                    if row.get('status', '').strip() == 'ssl_retry':
-                        row['status'] = ''  # Reset to pending
-                        reset_count += 1
-                        log.debug(f"Reset SSL error: {row.get('videoId')}")
-                    updated_rows.append(row)
-            
-            # Write updated CSV
-            with CSV_FILE.open('w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(updated_rows)
-            
-            log.info(f"Reset {reset_count} SSL errors for retry")
-        except Exception as e:
-            log.error(f"Error resetting SSL errors: {e}")
-    
-    def _remove_corrupted_entries(self) -> None:
-        """Remove corrupted CSV entries"""
-        valid_rows = []
-        removed_count = 0
+        def cleaned(header: List[str], rows: Iterable[List[str]]) -> Iterator[List[str]]:
+            vid_i, st_i = csv_columns(header)
+            for row in rows:
+                video_id = row[vid_i].strip()
+                if remove_corrupted and is_corrupted_id(video_id):
+                    counts['corrupted'] += 1
+                    log.debug(f"Removed corrupted entry: {video_id}")
+                    continue
+                status = row[st_i].strip()
+                if reset_ssl and status == 'ssl_retry':
+                    row[st_i] = ''  # Reset to pending
+                    counts['ssl'] += 1
+                    log.debug(f"Reset SSL error: {row[vid_i]}")
+                elif fix_missing and status == 'done' and video_id not in verified:
+                    row[st_i] = ''  # Reset to pending
+                    counts['missing'] += 1
+                    log.debug(f"Reset missing file: {video_id}")
+                yield row
         
-        try:
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                fieldnames = reader.fieldnames
-                
-                for row in reader:
-                    video_id = row.get('videoId', '').strip()
-                    # Check if valid video ID
-                    if (video_id and 
-                        len(video_id) == 11 and 
-                        ' ' not in video_id and 
-                        ',' not in video_id and
-                        not video_id.endswith('_VweaEx1j62do_vQ')):
-                        valid_rows.append(row)
-                    else:
-                        removed_count += 1
-                        log.debug(f"Removed corrupted entry: {video_id}")
-            
-            # Write cleaned CSV
-            with CSV_FILE.open('w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(valid_rows)
-            
-            log.info(f"Removed {removed_count} corrupted entries")
-        except Exception as e:
-            log.error(f"Error removing corrupted entries: {e}")
-    
-    def _fix_missing_files(self) -> None:
-        """Reset status for videos marked done but missing files"""
-        updated_rows = []
-        reset_count = 0
+        if self._rows is not None and csv_stamp() != self._rows_stamp:
+            log.info("CSV changed since it was analyzed, re-reading it")
+            self._rows = None
         
         try:
-            with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                fieldnames = reader.fieldnames
-                
-                for row in reader:
-                    if row.get('status', '').strip() == 'done':
-                        video_id = row.get('videoId', '').strip()
-                        if not self._file_exists(video_id):
-                            row['status'] = ''  # Reset to pending
-                            reset_count += 1
-                            log.debug(f"Reset missing file: {video_id}")
-                    updated_rows.append(row)
-            
-            # Write updated CSV
-            with CSV_FILE.open('w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(updated_rows)
-            
-            log.info(f"Reset {reset_count} entries with missing files")
+            if self._rows is not None:
+                write_download_csv(self._header, cleaned(self._header, self._rows))
+            else:
+                with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
+                    header, rows = iter_download_csv(f)
+                    write_download_csv(header, cleaned(header, rows))
         except Exception as e:
-            log.error(f"Error fixing missing files: {e}")
+            log.error(f"Error cleaning CSV: {e}")
+            return
+        
+        if reset_ssl:
+            log.info(f"Reset {counts['ssl']} SSL errors for retry")
+        if remove_corrupted:
+            log.info(f"Removed {counts['corrupted']} corrupted entries")
+        if fix_missing:
+            log.info(f"Reset {counts['missing']} entries with missing files")
     
     def _synchronize_archive(self) -> None:
         """Rebuild archive from actual files"""
         try:
-            actual_files = set()
-            extensions = ['.mp4', '.webm', '.mkv', '.m4a']
+            actual_files = downloaded_video_ids(self.downloads)
             
-            for ext in extensions:
-                for file_path in DOWNLOADS_DIR.glob(f"*{ext}"):
-                    video_id = file_path.stem
-                    if len(video_id) >= 10:
-                        actual_files.add(video_id)
-            
-            # Write new archive
-            with ARCHIVE_FILE.open('w', encoding='utf-8') as f:
-                for video_id in sorted(actual_files):
-                    f.write(f"youtube {video_id}\n")
+            # Write new archive, unless the one the analyzer read already matches
+            if actual_files != self._archive_ids:
+                write_archive_ids(actual_files)
             
             log.info(f"Synchronized archive with {len(actual_files)} verified files")
         except Exception as e:
@@ -322,58 +445,123 @@ class ErrorCleaner:
         """Clean up any partial files from failed downloads"""
         cleaned_count = 0
         try:
-            # Look for small files (likely incomplete)
-            for file_path in DOWNLOADS_DIR.glob("*"):
-                if file_path.is_file() and file_path.stat().st_size < 1024:  # Less than 1KB
-                    file_path.unlink()
-                    cleaned_count += 1
-                    log.debug(f"Removed small file: {file_path.name}")
+            # Look for small files (likely incomplete), dotfiles included as with glob("*")
+            with os.scandir(DOWNLOADS_DIR) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if entry.stat(follow_symlinks=False).st_size < 1024:  # Less than 1KB
+                        os.unlink(entry.path)
+                        cleaned_count += 1
+                        log.debug(f"Removed small file: {entry.name}")
             
             log.info(f"Cleaned up {cleaned_count} small/incomplete files")
+        except FileNotFoundError:
+            log.info("Cleaned up 0 small/incomplete files")
         except Exception as e:
             log.error(f"Error cleaning up files: {e}")
-    
-    def _file_exists(self, video_id: str) -> bool:
-        """Check if video file exists"""
-        extensions = ['.mp4', '.webm', '.mkv', '.m4a']
-        for ext in extensions:
-            file_path = DOWNLOADS_DIR / f"{video_id}{ext}"
-            if file_path.exists() and file_path.stat().st_size > 1024:
-                return True
-        return False
 
-def check_sync_status():
-    """Quick synchronization check"""
-    actual_files = set()
-    extensions = ['.mp4', '.webm', '.mkv', '.m4a']
-    
-    for ext in extensions:
-        for file_path in DOWNLOADS_DIR.glob(f"*{ext}"):
-            video_id = file_path.stem
-            if len(video_id) >= 10:  
-                actual_files.add(video_id)
-    
+def read_csv_done_ids() -> Set[str]:
+    """Video IDs marked done in the CSV"""
     csv_done = set()
     with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get('status', '').strip() == 'done':
-                video_id = row.get('videoId', '').strip()
+        header, rows = iter_download_csv(f)
+        vid_i, st_i = csv_columns(header)
+        for row in rows:
+            if row[st_i].strip() == 'done':
+                video_id = row[vid_i].strip()
                 if video_id:
                     csv_done.add(video_id)
+    return csv_done
+
+def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of path; size catches rewrites within one coarse mtime tick"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class DownloadIndex:
+    """
+    Persistent per-video record of (file on disk, done in CSV, in archive), kept in SQLite.
+
+    refresh() only re-reads a source (downloads directory, CSV, archive) when its
+    (mtime_ns, size) differs from the one recorded when it was last read, so repeated
+    check/sync runs on an unchanged tree do no scanning at all. Without an output
+    directory to keep it in, the index lives in memory and every source is scanned.
+    """
     
-    archive_videos = set()
-    if ARCHIVE_FILE.exists():
-        with ARCHIVE_FILE.open('r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('youtube '):
-                    video_id = line.split(' ', 1)[1]
-                    archive_videos.add(video_id)
+    def __init__(self, path: Path = INDEX_FILE):
+        try:
+            self.conn = sqlite3.connect(path if path.parent.is_dir() else ':memory:')
+        except sqlite3.Error as e:
+            log.warning(f"Cannot open {path}, indexing in memory: {e}")
+            self.conn = sqlite3.connect(':memory:')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                on_disk INTEGER NOT NULL DEFAULT 0,
+                csv_done INTEGER NOT NULL DEFAULT 0,
+                archived INTEGER NOT NULL DEFAULT 0
+            );
+            DROP TABLE IF EXISTS source_mtimes;
+            CREATE TABLE IF NOT EXISTS source_stamps (
+                source TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+        """)
+    
+    def __enter__(self) -> 'DownloadIndex':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.conn.close()
+    
+    def refresh(self) -> None:
+        """Re-read every source whose (mtime_ns, size) changed since it was last indexed"""
+        sources = [
+            ('files', DOWNLOADS_DIR, 'on_disk', lambda: downloaded_video_ids(snapshot_downloads())),
+            ('csv', CSV_FILE, 'csv_done', read_csv_done_ids),
+            ('archive', ARCHIVE_FILE, 'archived', read_archive_ids),
+        ]
+        with self.conn:
+            for source, path, column, load in sources:
+                stamp = _stamp(path)
+                row = self.conn.execute("SELECT mtime_ns, size FROM source_stamps WHERE source = ?", (source,)).fetchone()
+                if stamp is not None and row == stamp:
+                    continue
+                video_ids = load()
+                self.conn.execute(f"UPDATE videos SET {column} = 0 WHERE {column} = 1")
+                self.conn.executemany(
+                    f"INSERT INTO videos (video_id, {column}) VALUES (?, 1) "
+                    f"ON CONFLICT(video_id) DO UPDATE SET {column} = 1",
+                    ((video_id,) for video_id in video_ids))
+                if stamp is None:
+                    self.conn.execute("DELETE FROM source_stamps WHERE source = ?", (source,))
+                else:
+                    self.conn.execute("INSERT OR REPLACE INTO source_stamps VALUES (?, ?, ?)", (source, *stamp))
+                log.debug(f"Re-indexed {source}: {len(video_ids)} videos")
+            self.conn.execute("DELETE FROM videos WHERE on_disk = 0 AND csv_done = 0 AND archived = 0")
+    
+    def counts(self) -> Tuple[int, int, int, int]:
+        """(files, CSV done, archived, videos on which the three sources disagree)"""
+        return self.conn.execute("""
+            SELECT COALESCE(SUM(on_disk), 0), COALESCE(SUM(csv_done), 0), COALESCE(SUM(archived), 0),
+                   COALESCE(SUM(on_disk != csv_done OR on_disk != archived), 0)
+            FROM videos
+        """).fetchone()
+
+def check_sync_status():
+    """Quick synchronization check"""
+    with DownloadIndex() as index:
+        index.refresh()
+        files_count, csv_count, archive_count, mismatched = index.counts()
     
-    print(f"Files: {len(actual_files)}, CSV: {len(csv_done)}, Archive: {len(archive_videos)}")
+    print(f"Files: {files_count}, CSV: {csv_count}, Archive: {archive_count}")
     
-    if len(actual_files) == len(csv_done) == len(archive_videos) and actual_files == csv_done == archive_videos:
+    if mismatched == 0:
         print("✅ SYNCHRONIZED")
         return True
     else:
@@ -382,38 +570,32 @@ def check_sync_status():
 
 def sync_all_sources():
     """Synchronize all sources based on actual files"""
-    actual_files = set()
-    extensions = ['.mp4', '.webm', '.mkv', '.m4a']
+    with DownloadIndex() as index:
+        index.refresh()
+        files_count, _, _, mismatched = index.counts()
+    if mismatched == 0:
+        print(f"✅ Already synchronized ({files_count} files)")
+        return
     
-    for ext in extensions:
-        for file_path in DOWNLOADS_DIR.glob(f"*{ext}"):
-            video_id = file_path.stem
-            if len(video_id) >= 10:  
-                actual_files.add(video_id)
+    actual_files = downloaded_video_ids(snapshot_downloads())
     
-    # Update CSV
-    rows = []
-    with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        
-        for row in reader:
-            video_id = row.get('videoId', '').strip()
+    # Update CSV, streaming it through in one pass
+    def synced(header: List[str], rows: Iterable[List[str]]) -> Iterator[List[str]]:
+        vid_i, st_i = csv_columns(header)
+        for row in rows:
+            video_id = row[vid_i].strip()
             if video_id in actual_files:
-                row['status'] = 'done'
-            elif row.get('status', '').strip() == 'done':
-                row['status'] = ''
-            rows.append(row)
+                row[st_i] = 'done'
+            elif row[st_i].strip() == 'done':
+                row[st_i] = ''
+            yield row
     
-    with CSV_FILE.open('w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    with CSV_FILE.open('r', newline='', encoding='utf-8') as f:
+        header, rows = iter_download_csv(f)
+        write_download_csv(header, synced(header, rows))
     
     # Rebuild archive
-    with ARCHIVE_FILE.open('w', encoding='utf-8') as f:
-        for video_id in sorted(actual_files):
-            f.write(f"youtube {video_id}\n")
+    write_archive_ids(actual_files)
     
     print(f"✅ Synchronized {len(actual_files)} files")
 
@@ -432,11 +614,8 @@ def main():
     print("🚀 Download Error Analysis & Cleanup Tool")
     print("=" * 50)
     
-    # Initialize analyzer and cleaner
-    analyzer = ErrorAnalyzer()
-    cleaner = ErrorCleaner()
-    
     # Analyze errors
+    analyzer = ErrorAnalyzer()
     error_stats = analyzer.analyze_all_errors()
     
     # Show summary
@@ -458,6 +637,8 @@ def main():
     # Ask for confirmation
     response = input("\nProceed with cleanup? (y/N): ").lower().strip()
     if response == 'y' or response == 'yes':
+        # The cleaner fixes the rows the analyzer already read instead of re-reading the CSV
+        cleaner = ErrorCleaner.from_analyzer(analyzer)
         cleaner.cleanup_all_errors(error_stats)
         print("\n🎉 Cleanup completed!")
     else: